@@ -0,0 +1,128 @@
+import time
+import numpy as np
+from Storage import get_storage
+from OrderArchive import OrderArchive, archive_closed_orders, ARCHIVE_DIR
+
+
+def read_menu():
+    """Returns {item name: (category, type, price)} from the menu catalog."""
+    menu = {}
+    try:
+        catalog = get_storage().load_catalog()
+    except FileNotFoundError as e:
+        print(f"Error reading the menu: {e}")
+        return menu
+    for item in catalog.items:
+        try:
+            price = float(item['Price'])
+        except ValueError:
+            price = np.nan
+        menu[item['Name']] = (item['Category'], item['Type'], price)
+    return menu
+
+
+def group_sum(codes, weights, size):
+    return np.bincount(codes, weights=weights, minlength=size)
+
+
+def to_local_seconds(timestamps):
+    """Converts UTC epoch seconds to local wall-clock seconds since the epoch, each
+    with the UTC offset in force at that moment, so orders on either side of a DST
+    change keep their own hour. Offsets (and the times they change) are whole
+    quarter hours, so they are looked up once per distinct quarter hour."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    quarters, codes = np.unique(timestamps // 900, return_inverse=True)
+    offsets = np.array([time.localtime(int(quarter) * 900).tm_gmtoff for quarter in quarters], dtype=np.int64)
+    return timestamps + offsets[codes.reshape(-1)] if len(quarters) else timestamps
+
+
+class SalesAnalytics:
+    """Sales aggregates over the order archive, each computed with a handful of
+    vectorised group-bys (np.bincount over integer codes) instead of Python loops.
+
+    Line items are joined with the menu for their category, veg/non-veg type and,
+    for orders placed before unit prices were recorded, their price."""
+
+    def __init__(self, archive=None, menu=None):
+        self.archive = archive if archive is not None else OrderArchive()
+        self.menu = menu if menu is not None else read_menu()
+        a = self.archive
+        items = a.items
+
+        # Per distinct item: menu category / type codes and price
+        self.categories = sorted({self.menu[name][0] for name in items if name in self.menu}) + ['Other']
+        self.types = ['Vegetarian', 'Non-Vegetarian', 'Other']
+        category_codes = {name: i for i, name in enumerate(self.categories)}
+        type_codes = {name: i for i, name in enumerate(self.types)}
+        unknown = ('Other', 'Other', np.nan)
+        self.item_category = np.array([category_codes[self.menu.get(name, unknown)[0]] for name in items], dtype=np.int32)
+        self.item_type = np.array([type_codes.get(self.menu.get(name, unknown)[1], 2) for name in items], dtype=np.int32)
+        menu_price = np.array([self.menu.get(name, unknown)[2] for name in items], dtype=np.float64)
+
+        # Per line item: quantity and revenue (recorded price, else today's menu price)
+        self.qty = np.asarray(a['item_qty'], dtype=np.float64)
+        price = np.asarray(a['item_price'])
+        if len(items):
+            price = np.where(np.isnan(price), menu_price[a['item']], price)
+        self.revenue = self.qty * np.nan_to_num(price)
+
+        # Per order: local time of placement
+        local = to_local_seconds(a['placed_at'])
+        self.day = local // 86400
+        self.seconds_of_day = local % 86400
+
+    def totals(self):
+        """Returns (number of orders, revenue from order totals)."""
+        return len(self.archive), float(np.sum(self.archive['total']))
+
+    def by_item(self):
+        """Returns [(item, qty, revenue)], highest revenue first."""
+        a = self.archive
+        qty = group_sum(a['item'], self.qty, len(a.items))
+        revenue = group_sum(a['item'], self.revenue, len(a.items))
+        order = np.argsort(-revenue, kind='stable')
+        return [(a.items[i], int(qty[i]), float(revenue[i])) for i in order]
+
+    def by_category(self):
+        """Returns [(category, qty, revenue)], highest revenue first."""
+        return self.by_item_attribute(self.item_category, self.categories)
+
+    def by_type(self):
+        """Returns [(Vegetarian / Non-Vegetarian, qty, revenue)], highest revenue first."""
+        return self.by_item_attribute(self.item_type, self.types)
+
+    def by_item_attribute(self, item_attribute, names):
+        codes = item_attribute[self.archive['item']] if len(self.archive.items) else np.empty(0, dtype=np.int32)
+        qty = group_sum(codes, self.qty, len(names))
+        revenue = group_sum(codes, self.revenue, len(names))
+        order = np.argsort(-revenue, kind='stable')
+        return [(names[i], int(qty[i]), float(revenue[i])) for i in order if qty[i] > 0]
+
+    def by_day(self):
+        """Returns [(dd/mm/yy, orders, revenue)], most recent day first."""
+        days, codes = np.unique(self.day, return_inverse=True)
+        orders = np.bincount(codes, minlength=len(days))
+        revenue = group_sum(codes, self.archive['total'], len(days))
+        return [(time.strftime("%d/%m/%y", time.gmtime(int(days[i]) * 86400)), int(orders[i]), float(revenue[i]))
+                for i in range(len(days) - 1, -1, -1)]
+
+    def by_hour(self):
+        """Returns [(hour, orders, revenue)] for the 24 hours of the day.
+
+        Orders migrated from the old format only know their date, which was stored
+        as midnight; orders at exactly 00:00:00 are therefore left out."""
+        timed = self.seconds_of_day != 0
+        hours = (self.seconds_of_day[timed] // 3600).astype(np.int64)
+        orders = np.bincount(hours, minlength=24)
+        revenue = group_sum(hours, np.asarray(self.archive['total'])[timed], 24)
+        return [(hour, int(orders[hour]), float(revenue[hour])) for hour in range(24)]
+
+    def peak_hours(self, count=3):
+        """Returns the `count` busiest hours of the day by number of orders."""
+        return sorted(self.by_hour(), key=lambda row: row[1], reverse=True)[:count]
+
+
+def load_analytics(path=ARCHIVE_DIR):
+    """Archives any newly closed orders, then returns analytics over the whole archive."""
+    archive_closed_orders(path=path)
+    return SalesAnalytics(OrderArchive(path))
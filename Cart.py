@@ -0,0 +1,69 @@
+from decimal import Decimal, InvalidOperation
+
+
+def to_paise(price):
+    """Converts a price in rupees (as read from the menu, e.g. '180' or '99.50') to integer paise."""
+    try:
+        return int((Decimal(str(price).strip()) * 100).to_integral_value())
+    except InvalidOperation:
+        raise ValueError(f"Invalid price: {price!r}")
+
+
+class CartLine:
+    """One menu item in the cart; price is the unit price in paise."""
+    __slots__ = ('name', 'price', 'qty')
+
+    def __init__(self, name, price, qty):
+        self.name = name
+        self.price = price
+        self.qty = qty
+
+
+class Cart:
+    """Cart keyed by menu item name, with a running subtotal in paise.
+
+    Every operation touches only the line being changed, so looking up a
+    quantity while drawing a card, changing a quantity and checking out cost
+    O(1) or O(items in cart), never O(menu size)."""
+
+    def __init__(self):
+        self.lines = {}    # name -> CartLine, only for items with qty > 0
+        self.subtotal = 0  # paise
+
+    def qty(self, name):
+        line = self.lines.get(name)
+        return line.qty if line is not None else 0
+
+    def set_qty(self, name, price, qty):
+        """Sets the quantity of an item (price in paise) and updates the subtotal."""
+        line = self.lines.get(name)
+        if line is not None:
+            self.subtotal -= line.price * line.qty
+            if qty > 0:
+                line.price = price
+                line.qty = qty
+            else:
+                del self.lines[name]
+        elif qty > 0:
+            line = self.lines[name] = CartLine(name, price, qty)
+        if qty > 0:
+            self.subtotal += price * qty
+
+    def is_empty(self):
+        return not self.lines
+
+    def contents(self):
+        """Returns the cart as the list of single-key {name: qty} dictionaries orders store."""
+        return [{line.name: line.qty} for line in self.lines.values()]
+
+    def prices(self):
+        """Returns {name: unit price in rupees} for the items in the cart."""
+        return {line.name: line.price / 100 for line in self.lines.values()}
+
+    def total(self):
+        """Returns the subtotal in rupees."""
+        return self.subtotal / 100
+
+    def clear(self):
+        self.lines = {}
+        self.subtotal = 0
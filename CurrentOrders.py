@@ -1,9 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import csv
-import os  # For file handling
 import DataLoaders as DL  # Assuming this is where your CSV reading logic is
-from PIL import Image, ImageTk
+from ImageCache import get_photo
+from OrderCards import OrderCardPages
+from OrderSearch import DebouncedSearch
+from Storage import get_storage
+from TkExecutor import TkNotifier, BusyState, run_in_background
+
+FALLBACK_REFRESH_MS = 10000  # Polling only backs up the change notifications
 
 class OrderManagementApp(tk.Toplevel):
     def __init__(self, root):
@@ -21,7 +25,8 @@ class OrderManagementApp(tk.Toplevel):
         # Search Entry
         self.search_entry = tk.Entry(self, textvariable=self.search_var, width=30)
         self.search_entry.grid(row=0, column=0, padx=(10, 0), sticky='E', pady=10)
-        self.search_entry.bind("<KeyRelease>", self.on_search)
+        self.search_entry.bind("<KeyRelease>", lambda e: self.debounced_search.trigger())
+        self.debounced_search = DebouncedSearch(self, self.search_var, self.on_search)
 
         # Clear button
         self.clear_button = tk.Button(self, text="X", command=self.clear_search, relief='flat')
@@ -30,62 +35,106 @@ class OrderManagementApp(tk.Toplevel):
         self.done_btn = tk.Button(self, text="Done", command=self.on_closing, padx=10, pady=5, bg='#4CAF50', font=("Arial", 10, "bold"))
         self.done_btn.grid(row=0, sticky='e', column=2)
 
+        # Status line under the orders, shown while orders are read or saved in the background
+        self.busy_label = tk.Label(self, fg="gray")
+        self.busy_label.grid(row=2, column=0, columnspan=3, sticky='w', padx=10)
+        self.busy = BusyState(self.busy_label, "Updating orders...")
+
         # Notebook for displaying orders
         self.notebook = ttk.Notebook(self)
         self.notebook.grid(row=1, column=0, padx=10, columnspan=3, pady=10, sticky='nsew')
         self.grid_rowconfigure(1, weight=1)
 
-        self.info_image = Image.open("i.png")
-        self.info_image = self.info_image.resize((30, 30), Image.LANCZOS)  # Resize if necessary
-        self.info_photo = ImageTk.PhotoImage(self.info_image)
+        self.info_photo = get_photo("i.png", (30, 30))  # Shared with the other windows
+
+        # Order cards stay alive between refreshes, keyed by OrderID
+        self.card_pages = OrderCardPages(self.notebook, self.create_order_card, self.update_order_card, 7)
+
+        # Fold logged status changes into the order files in the background
+        get_storage().start_maintenance()
 
-        # Load orders and start periodic refresh
+        # Load orders, then update whenever orders are added or change status
+        self.active_orders = DL.open_active_orders(('Pending', 'Preparing'))
         self.orders = []
+        self.retry_job = None
+        self.updating = False         # A background update is running
+        self.update_requested = False # Another one is wanted once it finishes
+        self.notifier = TkNotifier(self, self.update_orders)
+        self.order_watch = get_storage().watch_orders(self.notifier.set)
         self.refresh_orders()
 
     def refresh_orders(self):
-        """Reads the orders and refreshes the UI every 10 seconds, skipping refresh if a ComboBox is focused."""
+        """Updates the orders every 10 seconds, in case a change notification was missed."""
+        self.update_orders()
+        self.after(FALLBACK_REFRESH_MS, self.refresh_orders)
+
+    def update_orders(self):
+        """Reads the changed orders and refreshes the UI, waiting while a ComboBox is focused."""
         # Check if a ComboBox has focus
         if self.focus_get() and isinstance(self.focus_get(), ttk.Combobox):
-            self.after(10000, self.refresh_orders)
+            if self.retry_job is None:
+                self.retry_job = self.after(500, self.retry_update)
+            return
+
+        if self.updating:
+            self.update_requested = True
             return
 
-        self.orders = [a for a in DL.read_orders_csv() if a['Status'] == 'Pending' or a['Status'] == 'Preparing']
-        self.orders.reverse()
+        # Only newly appended orders and status changes are read, off the Tk thread
+        self.updating = True
+        run_in_background(self, self.read_changed_orders, on_done=self.show_changed_orders, on_error=self.on_update_error, busy=self.busy)
 
-        # Populate the tabs with new data
-        self.populate_tabs(7)
+    def read_changed_orders(self):
+        """Runs on a worker thread; returns the active orders, or None if they did not change."""
+        if self.active_orders.refresh():
+            return self.active_orders.newest_first()
+        return None
 
-        # Schedule the next refresh after 10 seconds
-        self.after(10000, self.refresh_orders)
+    def show_changed_orders(self, orders):
+        self.finish_update()
+        # Nothing to redraw if no order changed
+        if orders is not None:
+            self.orders = orders
+
+            # Populate the tabs with new data
+            self.populate_tabs(7)
+
+    def on_update_error(self, error):
+        print(f"Error reading orders: {error}")
+        self.finish_update()
+
+    def finish_update(self):
+        self.updating = False
+        if self.update_requested:
+            self.update_requested = False
+            self.update_orders()
+
+    def retry_update(self):
+        self.retry_job = None
+        self.update_orders()
 
     def populate_tabs(self, orders_per_tab):
-        """Dynamically creates tabs and populates them with order cards."""
-        for tab in self.notebook.tabs():
-            self.notebook.forget(tab)
-
-        filtered_orders = self.get_filtered_orders()
-
-        num_tabs = (len(filtered_orders) + orders_per_tab - 1) // orders_per_tab
-        for i in range(num_tabs):
-            tab_frame = ttk.Frame(self.notebook)
-            self.notebook.add(tab_frame, text=f"Page {i + 1}")
-            tab_frame.columnconfigure(0, weight=1)
-
-            start = i * orders_per_tab
-            end = start + orders_per_tab
-            for order in filtered_orders[start:end]:
-                self.create_order_card(tab_frame, order)
-
-    def get_filtered_orders(self):
-        """Returns a list of orders filtered by the search term."""
-        search_term = self.search_var.get().lower()
-        return [
-            order for order in self.orders
-            if search_term in str(order["OrderID"]).lower() or
-            search_term in order["CustomerID"].lower() or
-            any(search_term in item.lower() for item in [str(list(a.keys())[0]) for a in order['Contents']])
-        ]
+        """Brings the tabs in line with the filtered orders, only touching the cards that changed.
+        The search term is looked up in the background when there is one."""
+        self.card_pages.per_page = orders_per_tab
+        query = self.search_var.get()
+        if not query.strip():
+            self.card_pages.render(self.orders)
+            return
+        run_in_background(self, get_storage().search_orders, query,
+                          on_done=lambda matches: self.show_filtered_orders(query, matches), busy=self.busy)
+
+    def show_filtered_orders(self, query, matches):
+        if query != self.search_var.get():
+            return  # The search changed meanwhile; its own lookup is on the way
+        self.card_pages.render(self.get_filtered_orders(matches))
+
+    def get_filtered_orders(self, matches):
+        """Returns the orders among the search matches (all of them for no search)."""
+        if matches is None:
+            return self.orders
+        matches = set(matches)
+        return [order for order in self.orders if order["OrderID"] in matches]
 
     def on_search(self, event=None):
         """Handles the search input and updates the displayed orders."""
@@ -93,18 +142,18 @@ class OrderManagementApp(tk.Toplevel):
 
     def clear_search(self):
         """Clears the search bar and repopulates the tabs with all orders."""
+        self.debounced_search.cancel()
         self.search_var.set("")
         self.populate_tabs(7)
 
     def create_order_card(self, parent, order):
-        """Creates a card for each order displaying its details."""
+        """Creates a card for an order displaying its details; OrderCardPages packs it into its page."""
         order_id = order["OrderID"]
         customer_id = order["CustomerID"]
-        contents = order["Contents"]
         status = order["Status"]
 
         frame = tk.Frame(parent, bg="white", bd=2, relief=tk.GROOVE)
-        frame.pack(fill=tk.X, padx=10, pady=5)
+        frame.order = order
 
         # Configure grid layout for alignment
         frame.grid_columnconfigure(0, weight=0)
@@ -117,12 +166,13 @@ class OrderManagementApp(tk.Toplevel):
 
         custname_label = tk.Label(frame, text=f"Customer ID: {customer_id}", font=("Arial", 16, "normal"), bg="white")
         custname_label.grid(row=0, column=2, sticky="e", padx=10, pady=(7, 0))
+        frame.custname_label = custname_label
 
         # Status label
         status_label = tk.Label(frame, text="Status:", bg="white")
         status_label.grid(row=1, column=1, sticky="e", padx=10, pady=10)
 
-        info_button = tk.Button(frame, image=self.info_photo, command=lambda: self.show_order_info(contents, order['Total']), relief='flat', background='white')
+        info_button = tk.Button(frame, image=self.info_photo, command=lambda: self.show_order_info(frame.order['Contents'], frame.order['Total']), relief='flat', background='white')
         info_button.grid(row=0, column=1, columnspan=2, padx=(3, 10), pady=(5, 0), sticky='w')
 
 
@@ -134,40 +184,25 @@ class OrderManagementApp(tk.Toplevel):
 
         # Add event handler for status change
         status_combobox.bind("<<ComboboxSelected>>", lambda e, order_id=order_id, customer_id=customer_id: self.on_status_change(order_id, customer_id, status_var.get()))
+        frame.status_var = status_var
+        return frame
+
+    def update_order_card(self, frame, order):
+        """Updates an existing card in place with the order's latest data."""
+        frame.order = order
+        frame.custname_label.config(text=f"Customer ID: {order['CustomerID']}")
+        frame.status_var.set(order["Status"])
 
     def on_status_change(self, order_id, customer_id, new_status):
-        """Handles the status change event by updating both orders.csv and {customer_id}_orders.csv."""
-        try:
-            self.update_order_status_in_csv("orders.csv", order_id, new_status)
-            self.update_order_status_in_csv(f"{customer_id}_orders.csv", order_id, new_status)
-            messagebox.showinfo("Status Updated", f"Order {order_id} status changed to {new_status}!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update status: {str(e)}")
-
-    def update_order_status_in_csv(self, filename, order_id, new_status):
-        """Updates the status of an order in the given CSV file."""
-        rows = []
-        file_exists = os.path.isfile(filename)
-
-        if not file_exists:
-            raise FileNotFoundError(f"{filename} does not exist!")
-
-        # Read CSV and update the status
-        with open(filename, mode='r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['OrderID'] == order_id:
-                    row['Status'] = new_status
-                rows.append(row)
-
-        # Write back to the CSV
-        with open(filename, mode='w', newline='') as file:
-            fieldnames = rows[0].keys()  # Get field names from the first row
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
+        """Handles the status change event by saving it in the background (with CSV storage,
+        logging it for orders.csv and {customer_id}_orders.csv)."""
+        run_in_background(self, DL.update_order_status, order_id, new_status,
+                          on_done=lambda result: messagebox.showinfo("Status Updated", f"Order {order_id} status changed to {new_status}!"),
+                          on_error=lambda e: messagebox.showerror("Error", f"Failed to update status: {str(e)}"),
+                          busy=self.busy)
 
     def on_closing(self):
+        self.order_watch.close()
         self.destroy()
     
     def show_order_info(self, items, total_price):
@@ -1,25 +1,20 @@
-import csv
 from datetime import datetime
-import ast  # To safely evaluate string representations of dictionaries
+import glob
+from OrderStore import get_order_store
+from FileOps import file_lock, lock_path_for
+from OrderContents import encode_contents, decode_contents, is_legacy, placed_at_from_order_id, DECODE_ERRORS
+from Storage import get_storage
 
 
 
 class CustomerSide:
     def __init__(self, path):
         self.path = path
-        self.items = {}
-        self.items_linear = []
-        with open(path, 'r') as file:
-            reader = csv.DictReader(file)
-            for item in reader:
-                self.items_linear.append(item)
-                cat = item['Category']
-                del item['Category']
-                if len(cat)>0:
-                    if cat in self.items.keys():
-                        self.items[cat].append(item)
-                    else:
-                        self.items[cat] = [item]
+        # Shared, pre-parsed snapshot of the menu; only re-read when the menu changes
+        catalog = get_storage().load_catalog()
+        self.catalog = catalog
+        self.items = catalog.by_category
+        self.items_linear = [item for items in catalog.by_category.values() for item in items]
 
 class CustomerCheckout:
     def __init__(self, username):
@@ -27,38 +22,24 @@ class CustomerCheckout:
         self.today_date = datetime.now().strftime("%d%m%y")
     
     def generate_customer_id(self, order_number):
-        """Generates customer ID using ddmmyy{username}{ordernumber}."""
-        return f"{self.today_date}{self.username}{order_number}"
+        """Generates the Order ID as ddmmyy{username}-{ordernumber}.
+
+        The dash keeps IDs unique when a username ends in digits."""
+        return f"{self.today_date}{self.username}-{order_number}"
 
     def get_next_order_number(self):
-        def getlastno(a):
-            s=''
-            for i in range(len(a)):
-                if not a[len(a)-i-1].isdigit():
-                    return s
-                else:
-                    s = a[len(a)-i-1] + s
-        """Checks {username}_orders.csv for today's orders and returns the next order number."""
-        file_name = f"{self.username}_orders.csv"
-        order_number = 1
-        try:
-            with open(file_name, mode='r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row['OrderID'].startswith(self.today_date):
-                        # Extract the order number
-                        order_number = int(getlastno(row['OrderID'])) + 1
-        except FileNotFoundError:
-            # If file doesn't exist, this is the first order
-            order_number = 1
-        return order_number
+        """Allocates the next order number for today from the customer's order counter."""
+        return get_storage().next_order_number(self.username, self.today_date)
     
-    def append_order_to_csv(self, contents, total, status):
-        """Appends the order details to {username}_orders.csv and orders.csv."""
+    def append_order_to_csv(self, contents, total, status, prices=None):
+        """Stores the order through the configured storage backend (with the CSV
+        backend: appends it to {username}_orders.csv and orders.csv).
+
+        prices ({name: unit price}) is stored with the line items when given."""
         order_number = self.get_next_order_number()
         customer_id = self.username
-        order_id = f"{self.today_date}{self.username}{order_number}"  # Create a unique Order ID, prefixing with "ORD"
-        contents_str = str(contents)  # Convert dictionary to string for CSV
+        order_id = self.generate_customer_id(order_number)  # Create a unique Order ID
+        contents_str = encode_contents(contents, prices)  # Versioned JSON encoding of the line items
         
         # Prepare the order data
         order_data = {
@@ -69,49 +50,65 @@ class CustomerCheckout:
             'Status': status
         }
 
-        # Append to {username}_orders.csv
-        user_file = f"{self.username}_orders.csv"
-        with open(user_file, mode='a', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=order_data.keys())
-            if file.tell() == 0:  # If file is empty, write headers
-                writer.writeheader()
-            writer.writerow(order_data)
-
-        # Append to orders.csv (global order list)
-        with open('orders.csv', mode='a', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=order_data.keys())
-            if file.tell() == 0:  # If file is empty, write headers
-                writer.writeheader()
-            writer.writerow(order_data)
+        get_storage().add_order(order_data)
     
 def parse_contents(contents_str):
     """Converts the contents string (from CSV) back into a dictionary."""
     try:
-        # Safely convert the string back into a dictionary
-        contents_dict = eval(contents_str)
-        if isinstance(contents_dict, dict):
-            return contents_dict
-        else:
-            raise ValueError("Parsed contents are not a dictionary")
-    except (SyntaxError, ValueError) as e:
+        contents_dict = {}
+        for item in decode_contents(contents_str):
+            contents_dict.update(item)
+        return contents_dict
+    except DECODE_ERRORS as e:
         print(f"Error parsing contents: {e}")
         return {}
 
-def read_orders_csv():
-    """Reads orders from the orders.csv file and returns a list of dictionaries."""
-    orders = []
+def read_order_ids():
+    """Returns every OrderID, oldest first, straight from the order index."""
     try:
-        with open('orders.csv', mode='r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Convert the Contents string to a dictionary
-                row['Contents'] = ast.literal_eval(row['Contents'])
-                orders.append(row)
+        return get_storage().order_ids()
     except Exception as e:
-        print(f"Error reading orders.csv: {e}")
-    return orders
+        print(f"Error reading orders: {e}")
+        return []
 
+def read_orders_by_id(order_ids):
+    """Reads just the given orders (from orders.csv by seeking to their rows)."""
+    try:
+        return get_storage().read_orders(order_ids)
+    except Exception as e:
+        print(f"Error reading orders: {e}")
+        return []
 
+def open_active_orders(statuses=('Pending', 'Preparing')):
+    """Returns the in-memory set of orders with the given statuses (Pending/Preparing
+    for the kitchen); refresh() brings it up to date and says whether it changed."""
+    return get_storage().active_orders(statuses)
 
-        
-                
\ No newline at end of file
+def update_order_status(order_id, new_status):
+    """Records a status change. With the CSV backend it is one append to the status
+    log, folded into orders.csv and {customer}_orders.csv later by
+    OrderStore.compact_status_log."""
+    get_storage().update_status(order_id, new_status)
+
+def migrate_order_contents():
+    """Re-encodes the Contents of every legacy row in orders.csv and the customers'
+    order files in the versioned JSON format. Rows already migrated are left alone,
+    so it is safe to run more than once."""
+    def migrate(row):
+        if not is_legacy(row['Contents']):
+            return False
+        try:
+            contents = decode_contents(row['Contents'])
+        except DECODE_ERRORS as e:
+            print(f"Skipping order {row['OrderID']}: {e}")  # Left as it is for a closer look
+            return False
+        row['Contents'] = encode_contents(contents, placed_at=placed_at_from_order_id(row['OrderID']))
+        return True
+
+    for file_name in ['orders.csv'] + glob.glob('*_orders.csv'):
+        with file_lock(lock_path_for(file_name)):
+            get_order_store(file_name).rewrite_rows(migrate)
+        print(f"Migrated {file_name}")
+
+if __name__ == "__main__":
+    migrate_order_contents()
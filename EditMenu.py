@@ -1,9 +1,14 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import csv
+from tkinter import ttk, messagebox, filedialog
+from MenuCatalog import next_item_id
+from Storage import get_storage
+from MenuJournal import MenuJournal
+from MenuTransfer import FILE_TYPES, read_records, validate_record, merge_records, export_items
+from TkExecutor import BusyState, run_in_background
 
 # CSV file paths
 MENU_FILE = "menu_items.csv"
+FLUSH_DELAY_MS = 1500  # Quiet period after the last edit before the menu file is written
 
 class AdminMenuApp(tk.Toplevel):
     def __init__(self, root):
@@ -44,18 +49,42 @@ class AdminMenuApp(tk.Toplevel):
         self.done_btn = tk.Button(self, text="Done", command=self.on_closing, padx=10, pady=5,bg = '#4CAF50', font=("Arial", 10, "bold"))
         self.done_btn.grid(row = 0, sticky='e', columnspan=3)
 
+        # Status line under the buttons, shown while the menu is read or written in the background
+        self.busy_label = tk.Label(self, fg="gray")
+        self.busy_label.grid(row=5, column=0, columnspan=3, sticky='w', padx=10)
+
         self.add_btn.grid(row=2, column=0, sticky="ew")
         self.edit_btn.grid(row=2, column=1, sticky="ew")
         self.delete_btn.grid(row=2, column=2, sticky="ew")
 
-        # Undo Button
+        # Undo / Redo Buttons
         self.undo_btn = tk.Button(self, text="Undo", command=self.undo, padx=10, pady=5, bg="yellow", font=("Arial", 10, "bold"))
-        self.undo_btn.grid(row=3, column=0, columnspan=3, sticky="ew")
+        self.undo_btn.grid(row=3, column=0, columnspan=2, sticky="ew")
+        self.redo_btn = tk.Button(self, text="Redo", command=self.redo, padx=10, pady=5, bg="khaki", font=("Arial", 10, "bold"))
+        self.redo_btn.grid(row=3, column=2, sticky="ew")
         root.bind("<Control-z>", lambda event: self.undo())  # Bind Ctrl+Z for undo
-
-        # Initialize action history for undo feature
-        self.action_history = []
-        self.update_undo_button()
+        root.bind("<Control-y>", lambda event: self.redo())  # Bind Ctrl+Y for redo
+
+        # Bulk Import / Export Buttons
+        self.import_btn = tk.Button(self, text="Import Items", command=self.import_items, padx=10, pady=5, bg="lightgray", font=("Arial", 10, "bold"))
+        self.import_btn.grid(row=4, column=0, columnspan=2, sticky="ew")
+        self.export_btn = tk.Button(self, text="Export Items", command=self.export_items, padx=10, pady=5, bg="lightgray", font=("Arial", 10, "bold"))
+        self.export_btn.grid(row=4, column=2, sticky="ew")
+
+        # Edits go to the Treeview and the journal straight away; the file is written behind them
+        self.journal = MenuJournal()
+        self.dirty = False
+        self.flush_job = None
+        self.flushing = False     # A write is running in the background
+        self.flush_waiters = []   # Called with True / False once the menu is saved (or not)
+        self.saving = BusyState(self.busy_label, "Saving menu...")
+        self.loading = BusyState(self.busy_label, "Loading menu...")
+        self.editing_buttons = (self.add_btn, self.delete_btn, self.import_btn, self.export_btn)
+        self.importing = BusyState(self.busy_label, "Importing items...", self.editing_buttons)
+        self.categories = []
+        self.category_set = set()
+        self.category_bounds = {}
+        self.next_id = None       # Set once the menu is loaded
 
         # Tag configuration for color coding
         self.tree.tag_configure("veg", background="#98FB98")  # Light green
@@ -64,59 +93,244 @@ class AdminMenuApp(tk.Toplevel):
         # Bind selection change event to disable Edit button for multiple selections
         self.tree.bind("<<TreeviewSelect>>", self.on_selection_change)
 
-        # Load the menu
-        self.load_menu()
+        # Load the menu and the journal in the background, then replay edits the menu file does not hold yet.
+        # Editing stays off until the menu is shown, so a half-loaded tree is never saved over the file
+        self.update_undo_button()
+        self.set_editing(False)
+        run_in_background(self, self.read_menu, on_done=self.show_loaded_menu, on_error=self.on_load_error, busy=self.loading)
+
+    def read_menu(self):
+        """Runs on a worker thread; returns the catalog and the journaled edits to replay."""
+        return get_storage().load_catalog(), self.journal.load()
+
+    def show_loaded_menu(self, result):
+        catalog, pending = result
+        self.show_menu(catalog.rows, catalog.ids)
+        for command in pending:
+            self.apply_command(command)
+        if pending:
+            self.save_menu()
+        self.next_id = next_item_id(list(self.item_ids()) + self.journal.ids())
+        self.update_undo_button()
+        self.set_editing(True)
 
-    def load_menu(self):
-        """Load the menu from the CSV file into the Treeview."""
+    def set_editing(self, enabled):
+        for button in self.editing_buttons:
+            button.config(state="normal" if enabled else "disabled")
+
+    def on_load_error(self, error):
+        """Closes the editor if the menu cannot be loaded (or created), as there is nothing to edit."""
+        if isinstance(error, FileNotFoundError):
+            if messagebox.askyesno("Error", f"{MENU_FILE} not found!\nMake new menu file?"):
+                run_in_background(self, self.create_menu,
+                                  on_done=self.show_loaded_menu,
+                                  on_error=self.on_create_error,
+                                  busy=self.loading)
+                return
+        else:
+            messagebox.showerror("Error", f"Failed to load the menu: {str(error)}")
+        self.destroy()
+
+    def on_create_error(self, error):
+        messagebox.showerror("Error", f"Failed to create the menu: {str(error)}")
+        self.destroy()
+
+    def create_menu(self):
+        """Runs on a worker thread; writes an empty menu and reads it back."""
+        get_storage().write_menu([], [])
+        return self.read_menu()
+
+    def show_menu(self, rows, ids):
+        """Shows the given menu rows in the Treeview."""
         self.tree.delete(*self.tree.get_children())  # Clear current contents
-        self.categories = []
+        self.categories = []           # Category names in menu order, for the dialog
+        self.category_set = set()
+        self.category_bounds = {}      # category -> [first item ID, last item ID]
+        last_category = None
+        last_row = None
+        for row, row_id in zip(rows, ids):
+            category, name, price, description, food_type = row
+            # Insert separator if category changes
+            if category != last_category and last_row is not None and last_row[1] != "------":
+                if last_category is not None:  # Insert a separator for the previous category
+                    self.tree.insert("", "end", values=("", "------", "", "", ""), tags=("separator",))
+                last_category = category
+
+            # Insert the data into Treeview under its stable ID, colored by "Vegetarian" / "Non-Vegetarian"
+            self.tree.insert("", "end", iid=row_id, values=row, tags=self.tags_for(food_type))
+            if category in self.category_set:
+                self.category_bounds[category][1] = row_id
+            else:
+                self.add_category(category, row_id)
+
+            last_row = row
+
+    def add_category(self, category, item_id):
+        self.category_set.add(category)
+        self.category_bounds[category] = [item_id, item_id]
+        if category:
+            self.categories.append(category)
+
+    def index_insert(self, item_id):
+        """Updates the category index for an item just placed in the Treeview.
+        Only the item's neighbours are looked at, so this takes constant time."""
+        category = self.tree.set(item_id, "Category")
+        if category not in self.category_set:
+            self.add_category(category, item_id)
+            return
+        bounds = self.category_bounds[category]
+        if self.neighbour(item_id, self.tree.prev) == bounds[1]:
+            bounds[1] = item_id
+        if self.neighbour(item_id, self.tree.next) == bounds[0]:
+            bounds[0] = item_id
+
+    def index_remove(self, item_id):
+        """Updates the category index for an item about to leave the Treeview (or its category)."""
+        category = self.tree.set(item_id, "Category")
+        bounds = self.category_bounds.get(category)
+        if bounds is None:
+            return
+        if bounds[0] == item_id and bounds[1] == item_id:
+            del self.category_bounds[category]
+            self.category_set.discard(category)
+            if category:
+                self.categories.remove(category)
+        elif bounds[0] == item_id:
+            bounds[0] = self.neighbour(item_id, self.tree.next)
+        elif bounds[1] == item_id:
+            bounds[1] = self.neighbour(item_id, self.tree.prev)
+
+    def set_values(self, item_id, row):
+        """Changes an item's values. An item changing category is moved to the end of
+        its new one, as the index relies on every category being one block."""
+        if str(self.tree.set(item_id, "Category")) != str(row[0]):
+            self.index_remove(item_id)
+            self.tree.delete(item_id)
+            self.insert_item({'id': item_id, 'row': row, 'prev': self.get_last_item(row[0]), 'next': ''})
+            return
+        self.tree.item(item_id, values=row, tags=self.tags_for(row[4]))
+
+    def tags_for(self, food_type):
+        if food_type == "Vegetarian":
+            return ("veg",)
+        if food_type == "Non-Vegetarian":
+            return ("non_veg",)
+        return ()
+
+    def save_menu(self):
+        """Marks the menu as changed. The file is written once the edits have been
+        quiet for FLUSH_DELAY_MS, so a burst of edits costs a single write."""
+        self.dirty = True
+        if self.flush_job is not None:
+            self.after_cancel(self.flush_job)
+        self.flush_job = self.after(FLUSH_DELAY_MS, self.flush_menu)
+
+    def flush_menu(self, on_done=None):
+        """Writes the rows shown in the Treeview to the menu file on a worker thread, if
+        they changed, then calls on_done(saved). The rows are copied here, so editing
+        can go on while they are written; those edits are saved by the next flush."""
+        if self.flush_job is not None:
+            self.after_cancel(self.flush_job)
+            self.flush_job = None
+        if on_done is not None:
+            self.flush_waiters.append(on_done)
+        if self.flushing:
+            return  # Picked up when the running write finishes
+        if self.next_id is None:
+            self.finish_flush(True)  # The menu was never loaded, so there is nothing to save
+            return
+        if not self.dirty:
+            self.finish_flush(True)
+            return
+        rows, ids = self.current_rows()
+        through = self.journal.lines  # The journal records the write covers
+        self.dirty = False
+        self.flushing = True
+        run_in_background(self, get_storage().write_menu, rows, ids,
+                          on_done=lambda result: self.on_flushed(through), on_error=self.on_flush_error, busy=self.saving)
+
+    def on_flushed(self, through):
+        self.flushing = False
         try:
-            with open(MENU_FILE, newline='') as csvfile:
-                reader = csv.reader(csvfile)
-                next(reader)  # Skip the header row
-                last_category = None
-                last_row = None
-                for row in reader:
-                    # Skip empty lines
-                    if not row or len(row) < 5:
-                        continue
-                    
-                    category, name, price, description, food_type = row
-                    if len(category) > 0 and category not in self.categories:
-                        self.categories.append(category)
-                    # Insert separator if category changes
-                    if category != last_category and last_row is not None and last_row[1] != "------":
-                        if last_category is not None:  # Insert a separator for the previous category
-                            self.tree.insert("", "end", values=("", "------", "", "", ""), tags=("separator",))
-                        last_category = category
-                                      
-                    # Insert the data into Treeview
-                    item_id = self.tree.insert("", "end", values=row)
-
-                    # Apply color to "Vegetarian" and "Non-Vegetarian" cells
-                    if food_type == "Vegetarian":
-                        self.tree.item(item_id, tags=("veg",))
-                    elif food_type == "Non-Vegetarian":
-                        self.tree.item(item_id, tags=("non_veg",))
-                    
-                    last_row = row
-                    
-        except FileNotFoundError:
-            if messagebox.askyesno("Error", f"{MENU_FILE} not found!\nMake new menu file?"):
-                with open('menu_items.csv', mode='w', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(["Category", "Name", "Price", "Description", "Type"])
-
-    def save_menu(self, rows):
-        """Save the current rows back to the CSV file in the correct format."""
-        with open(MENU_FILE, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Category", "Name", "Price", "Description", "Type"])  # Write the header
-            for row in rows:
-                if row[1] != "------":  # Write only non-empty rows
-                    writer.writerow(row)
-        self.load_menu()
+            self.journal.checkpoint(through)
+        except OSError as e:
+            print(f"Error writing the menu journal: {e}")  # Only means more edits are replayed next time
+        if self.dirty and self.flush_job is None:
+            self.flush_menu()  # Edits made during the write that no timer will save
+        else:
+            self.finish_flush(True)
+
+    def on_flush_error(self, error):
+        self.flushing = False
+        self.dirty = True
+        messagebox.showerror("Error", f"Failed to save the menu: {str(error)}")
+        self.finish_flush(False)
+
+    def finish_flush(self, saved):
+        waiters, self.flush_waiters = self.flush_waiters, []
+        for on_done in waiters:
+            on_done(saved)
+
+    def is_separator(self, item_id):
+        return "separator" in self.tree.item(item_id, 'tags')
+
+    def item_ids(self):
+        """IDs of the menu items in the Treeview, in order, skipping separators."""
+        return (item_id for item_id in self.tree.get_children() if not self.is_separator(item_id))
+
+    def neighbour(self, item_id, step):
+        """The nearest menu item before (step=self.tree.prev) or after (self.tree.next) item_id."""
+        item_id = step(item_id)
+        while item_id and self.is_separator(item_id):
+            item_id = step(item_id)
+        return item_id
+
+    def placement(self, item_id):
+        """Where an item sits, as the IDs of the items around it (for putting it back)."""
+        return {'id': item_id, 'row': list(self.tree.item(item_id, 'values')),
+                'prev': self.neighbour(item_id, self.tree.prev), 'next': self.neighbour(item_id, self.tree.next)}
+
+    def insert_item(self, item):
+        """Inserts an item next to the neighbours it had, staying inside its category."""
+        row, prev, next_id = item['row'], item['prev'], item['next']
+        if prev and self.tree.exists(prev) and self.tree.set(prev, "Category") == row[0]:
+            index = self.tree.index(prev) + 1
+        elif next_id and self.tree.exists(next_id):
+            index = self.tree.index(next_id)
+        elif prev and self.tree.exists(prev):
+            index = self.tree.index(prev) + 1
+        else:
+            index = "end"
+        self.tree.insert("", index, iid=item['id'], values=row, tags=self.tags_for(row[4]))
+        self.index_insert(item['id'])
+
+    def apply_command(self, command):
+        """Applies a journal command to the Treeview. Commands are idempotent:
+        inserting an item that is already there just updates it."""
+        if command['op'] == 'insert':
+            for item in command['items']:
+                if self.tree.exists(item['id']):
+                    self.set_values(item['id'], item['row'])
+                else:
+                    self.insert_item(item)
+        elif command['op'] == 'remove':
+            for item in reversed(command['items']):
+                if self.tree.exists(item['id']):
+                    self.index_remove(item['id'])
+                    self.tree.delete(item['id'])
+        elif command['op'] == 'batch':
+            for each in command['commands']:
+                self.apply_command(each)
+        elif command['op'] == 'edit':
+            if self.tree.exists(command['id']):
+                self.set_values(command['id'], command['new'])
+
+    def do(self, command):
+        """Journals and applies a new edit."""
+        self.journal.record(command)
+        self.apply_command(command)
+        self.save_menu()
+        self.update_undo_button()
 
     def add_item(self):
         """Open a dialog to add a new menu item."""
@@ -149,54 +363,43 @@ class AdminMenuApp(tk.Toplevel):
 
         confirm = messagebox.askyesno("Confirm Delete", "Are you sure you want to delete the selected item(s)?")
         if confirm:
-            # Store deleted items and their indices for undo
-            deleted_items = []
-            deleted_item_indices = []
-            for item in selected_items:
-                deleted_item_indices.append(self.tree.index(item))
+            # Record where each item was, in tree order, so undo puts them back in place
+            selected_items = sorted(selected_items, key=self.tree.index)
+            items = [self.placement(item) for item in selected_items if not self.is_separator(item)]
             for item in selected_items:
-                item_values = self.tree.item(item, 'values')
-                item_index = self.tree.index(item)
-                item_tags = self.tree.item(item, 'tags')
-                deleted_items.append({"values": item_values, "index": item_index, "tags": item_tags})
-                self.tree.delete(item)
-            
-            for i in range(len(deleted_item_indices)):
-                deleted_items[i]['index'] = deleted_item_indices[i]
-
-            # Update action history for delete
-            self.action_history.append({
-                "action": "delete",
-                "items": deleted_items
-            })
-            self.save_menu([self.tree.item(item, 'values') for item in self.tree.get_children()])
-            self.update_undo_button()
+                if self.is_separator(item):
+                    self.tree.delete(item)
+            if items:
+                self.do({'op': 'remove', 'items': items})
 
     def undo(self):
         """Undo the last action."""
-        if not self.action_history:
+        if self.next_id is None:
+            return  # Still loading
+        command = self.journal.undo()
+        if command is None:
             messagebox.showinfo("Undo", "No actions to undo.")
             return
+        self.apply_command(command)
+        self.save_menu()
+        self.update_undo_button()
 
-        last_action = self.action_history.pop()
-        if last_action["action"] == "add":
-            self.tree.delete(self.tree.get_children()[-1 if last_action['index'] == 'end' else last_action['index']])  # Remove last item
-        elif last_action["action"] == "edit":
-            # Restore previous values for edit
-            self.tree.delete(self.tree.get_children()[last_action['index']])
-            item_id = self.tree.insert("", last_action['index'], values=last_action["item"])
-            self.tree.item(item_id, values=last_action["item"])  # Restore old item values
-        elif last_action["action"] == "delete":
-            last_action["items"].sort(key=lambda element: element['index'])
-            for deleted in last_action["items"]:
-                self.tree.insert("", deleted["index"], values=deleted["values"], tags=deleted["tags"])
-
-        self.save_menu([self.tree.item(item, 'values') for item in self.tree.get_children()])
+    def redo(self):
+        """Redo the last undone action."""
+        if self.next_id is None:
+            return  # Still loading
+        command = self.journal.redo()
+        if command is None:
+            messagebox.showinfo("Redo", "No actions to redo.")
+            return
+        self.apply_command(command)
+        self.save_menu()
         self.update_undo_button()
 
     def update_undo_button(self):
-        """Enable or disable the undo button based on action history."""
-        self.undo_btn.config(state="normal" if len(self.action_history)>0 else "disabled")
+        """Enable or disable the undo / redo buttons based on the journal."""
+        self.undo_btn.config(state="normal" if self.journal.undo_stack else "disabled")
+        self.redo_btn.config(state="normal" if self.journal.redo_stack else "disabled")
 
     def on_selection_change(self, event):
         """Disable Edit button if multiple items are selected."""
@@ -250,46 +453,109 @@ class AdminMenuApp(tk.Toplevel):
             messagebox.showwarning("Input Error", "All fields must be filled in.")
             return
 
-        if item_id:  # If editing an existing item
-            print('editing')
-            index = self.tree.index(item_id)
-            self.tree.item(item_id, values=(category, name, price, description, food_type))
-            self.action_history.append({
-            "action": "edit",
-            "item": item_values,
-            "index": index
-            })
+        row = [category, name, price, description, food_type]
+        if item_id and str(item_values[0]) != category:  # Moving an item to another category
+            # Taken out and put back at the end of its new category, as one edit, so undo
+            # returns it to the exact place it came from
+            placement = self.placement(item_id[0])
+            prev = self.get_last_item(category)
+            if prev == item_id[0]:
+                prev = placement['prev']
+            self.do({'op': 'batch', 'commands': [{'op': 'remove', 'items': [placement]},
+                                                 {'op': 'insert', 'items': [{'id': item_id[0], 'row': row, 'prev': prev, 'next': ''}]}]})
+        elif item_id:  # If editing an existing item
+            self.do({'op': 'edit', 'id': item_id[0], 'old': list(item_values), 'new': row})
         else:  # Adding new item
-            # Get the last item index in the same category
-            last_item_index = self.get_last_index(category)
-            self.tree.insert("", last_item_index, values=(category, name, price, description, food_type))
-            self.action_history.append({
-            "action": "add",
-            "item": (category, name, price, description, food_type),
-            "index": last_item_index
-            })
-        self.save_menu([self.tree.item(item, 'values') for item in self.tree.get_children()])
+            # Place it after the last item in the same category
+            prev = self.get_last_item(category)
+            self.do({'op': 'insert', 'items': [{'id': str(self.next_id), 'row': row, 'prev': prev, 'next': ''}]})
+            self.next_id += 1
         self.dialog.destroy()
         self.update_undo_button()
         messagebox.showinfo("Success", "Item saved successfully.")
         # Close the dialog window
         self.category_combobox.master.destroy()
 
-    def get_last_index(self, cat):
-        index = 'end'
-        lastcatwassame = False
-        items = [self.tree.item(item, 'values') for item in self.tree.get_children()]
-        for i in range(len(items)) :
-            if lastcatwassame and not items[i][0] == cat:
-                return i
-            if items[i][0] == cat:
-                lastcatwassame = True
-        return index
-
-            
-    
+    def current_rows(self):
+        """Returns (rows, ids) of the menu items in the Treeview, in order."""
+        ids = list(self.item_ids())
+        return [tuple(str(value) for value in self.tree.item(item_id, 'values')) for item_id in ids], ids
+
+    def import_items(self):
+        """Merges menu items from a CSV / JSON file into the menu, as one undoable
+        edit shown with a single reload and saved with a single write. The file is
+        read and checked on a worker thread."""
+        path = filedialog.askopenfilename(parent=self, title="Import Menu Items", filetypes=FILE_TYPES + [("All files", "*.*")])
+        if not path:
+            return
+        run_in_background(self, self.read_import, path,
+                          on_done=self.merge_import,
+                          on_error=lambda e: messagebox.showerror("Import Failed", f"Could not read {path}: {str(e)}"),
+                          busy=self.importing)
+
+    def read_import(self, path):
+        """Runs on a worker thread; returns the valid (row, id) records and the errors."""
+        records = []
+        errors = []
+        for number, record in read_records(path):
+            try:
+                records.append(validate_record(record))
+            except ValueError as e:
+                errors.append(f"Row {number}: {e}")
+        return records, errors
+
+    def merge_import(self, result):
+        records, errors = result
+        shown_errors = "\n".join(errors[:10]) + ("\n..." if len(errors) > 10 else "")
+        if not records:
+            messagebox.showwarning("Import", "No valid items found.\n" + shown_errors)
+            return
+        if errors and not messagebox.askyesno("Import", f"{len(errors)} row(s) are invalid and will be skipped:\n{shown_errors}\n\nImport the {len(records)} valid row(s)?"):
+            return
+
+        rows, ids = self.current_rows()
+        rows, ids, command, added, updated, self.next_id = merge_records(rows, ids, records, self.next_id)
+        if command is None:
+            messagebox.showinfo("Import", "The menu already has these items.")
+            return
+
+        self.journal.record(command)
+        self.show_menu(rows, ids)
+        self.dirty = True
+        self.flush_menu()  # Saved straight away rather than after the quiet period
+        self.update_undo_button()
+        messagebox.showinfo("Import", f"Added {added} and updated {updated} item(s).")
+
+    def export_items(self):
+        """Writes the menu to a CSV / JSON file."""
+        path = filedialog.asksaveasfilename(parent=self, title="Export Menu Items", defaultextension=".csv", filetypes=FILE_TYPES)
+        if not path:
+            return
+        rows, ids = self.current_rows()
+        run_in_background(self, export_items, path, rows, ids,
+                          on_done=lambda result: messagebox.showinfo("Export", f"Exported {len(rows)} item(s)."),
+                          on_error=lambda e: messagebox.showerror("Export Failed", f"Could not write {path}: {str(e)}"),
+                          busy=self.saving)
+
+    def get_last_item(self, cat):
+        """ID of the last item of the category, or of the last item in the menu if the category is new."""
+        if cat in self.category_set:
+            return self.category_bounds[cat][1]
+        children = self.tree.get_children()
+        if not children:
+            return ''
+        last = children[-1]
+        return self.neighbour(last, self.tree.prev) if self.is_separator(last) else last
+
     def on_closing(self):
-        self.destroy()  # Close AdminMenuApp
+        """Closes the editor once the menu is saved, asking first if it cannot be."""
+        def close(saved):
+            if not self.winfo_exists():
+                return  # Already closed by an earlier click
+            if not saved and not messagebox.askyesno("Unsaved Changes", "The menu could not be saved. Close anyway?"):
+                return
+            self.destroy()  # Close AdminMenuApp
+        self.flush_menu(close)
 
 if __name__ == "__main__":
     root = tk.Tk()
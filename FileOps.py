@@ -0,0 +1,58 @@
+import functools
+import os
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive advisory lock on the given lock file, across processes."""
+    with open(path, 'a+b') as file:
+        if os.name == 'nt':
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about ten seconds; keep waiting
+                    continue
+        else:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def lock_path_for(path):
+    """The lock file guarding writes to the given data file."""
+    return path + '.lock'
+
+
+def atomic_write_text(path, text):
+    """Writes the whole file through a temporary file and a rename, so readers
+    (and a crash half-way through) see either the old or the new contents."""
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'w', newline='') as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def synchronized(method):
+    """Runs the method while holding the instance's self.lock (a threading.RLock)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,105 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+
+
+class InotifyWaiter:
+    """Waits for changes to the given files with Linux inotify. The directories are
+    watched rather than the files, so a file replaced by a rename (compaction,
+    atomic writes) is still noticed."""
+
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x2 | 0x4 | 0x8 | 0x80 | 0x100 | 0x200
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.names = {os.path.basename(path) for path in paths}
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in paths}:
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+                error = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(error, f"Cannot watch {directory}")
+
+    def wait(self, timeout):
+        """Returns True if one of the files may have changed, False after timeout seconds."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        changed = False
+        try:
+            while True:
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    _, _, _, length = self.EVENT.unpack_from(data, offset)
+                    offset += self.EVENT.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+                    changed |= name in self.names
+        except BlockingIOError:
+            pass
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WindowsChangeWaiter:
+    """Waits for changes in the directories of the given files with Windows change
+    notifications. These do not say which file changed, so any write in the
+    directory wakes the waiter; the caller compares its own token afterwards."""
+
+    # FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_SIZE | FILE_NOTIFY_CHANGE_LAST_WRITE
+    FILTER = 0x1 | 0x8 | 0x10
+    WAIT_TIMEOUT = 0x102
+
+    def __init__(self, paths):
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self.kernel32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        self.kernel32.FindFirstChangeNotificationW.argtypes = [ctypes.c_wchar_p, ctypes.c_int, ctypes.c_uint32]
+        self.kernel32.FindNextChangeNotification.argtypes = [ctypes.c_void_p]
+        self.kernel32.FindCloseChangeNotification.argtypes = [ctypes.c_void_p]
+        self.kernel32.WaitForMultipleObjects.argtypes = [ctypes.c_uint32, ctypes.c_void_p, ctypes.c_int, ctypes.c_uint32]
+        self.kernel32.WaitForMultipleObjects.restype = ctypes.c_uint32
+        self.handles = []
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in paths}:
+            handle = self.kernel32.FindFirstChangeNotificationW(directory, False, self.FILTER)
+            if handle is None or handle == ctypes.c_void_p(-1).value:
+                error = ctypes.get_last_error()
+                self.close()
+                raise OSError(error, f"Cannot watch {directory}")
+            self.handles.append(handle)
+        self.array = (ctypes.c_void_p * len(self.handles))(*self.handles)
+
+    def wait(self, timeout):
+        result = self.kernel32.WaitForMultipleObjects(len(self.handles), self.array, False, int(timeout * 1000))
+        if result >= len(self.handles):
+            return False  # Timed out
+        self.kernel32.FindNextChangeNotification(self.handles[result])
+        return True
+
+    def close(self):
+        for handle in self.handles:
+            self.kernel32.FindCloseChangeNotification(handle)
+        self.handles = []
+
+
+def open_change_waiter(paths):
+    """Returns an object whose wait(timeout) blocks until one of the files may have
+    changed (True) or the timeout passes (False), or None where the platform has
+    no change notifications this module supports, in which case callers poll."""
+    if not paths:
+        return None
+    try:
+        if os.name == 'nt':
+            return WindowsChangeWaiter(paths)
+        if hasattr(os, 'O_CLOEXEC') and os.uname().sysname == 'Linux':
+            return InotifyWaiter(paths)
+    except (OSError, AttributeError) as e:
+        print(f"Change notifications unavailable, polling instead: {e}")
+    return None
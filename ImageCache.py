@@ -0,0 +1,52 @@
+import os
+import time
+from collections import OrderedDict
+from PIL import Image, ImageTk
+
+
+class ImageCache:
+    """Process-wide cache of decoded and resized images, keyed by (path, size, filter).
+
+    Every window asking for the same icon at the same size gets the same
+    PhotoImage, so it is read from disk and resized once. The least recently used
+    entries are dropped past max_entries, and an entry is reloaded when its
+    file's mtime changes (checked at most every check_interval seconds).
+    Widgets showing an image should still keep a reference to it, as usual with
+    Tk, so an evicted image stays alive for as long as it is on screen."""
+
+    def __init__(self, max_entries=64, check_interval=2.0):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.entries = OrderedDict()  # key -> [mtime, last checked, PhotoImage]
+
+    def get(self, path, size=None, resample=Image.LANCZOS):
+        key = (path, size, resample)
+        entry = self.entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            if now - entry[1] < self.check_interval:
+                self.entries.move_to_end(key)
+                return entry[2]
+            entry[1] = now
+            if os.stat(path).st_mtime_ns == entry[0]:
+                self.entries.move_to_end(key)
+                return entry[2]
+
+        mtime = os.stat(path).st_mtime_ns
+        image = Image.open(path)
+        if size is not None:
+            image = image.resize(size, resample)
+        photo = ImageTk.PhotoImage(image)
+        self.entries[key] = [mtime, now, photo]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return photo
+
+
+_cache = ImageCache()
+
+
+def get_photo(path, size=None, resample=Image.LANCZOS):
+    """Returns the shared PhotoImage of the image at path, resized to size (width, height)."""
+    return _cache.get(path, size, resample)
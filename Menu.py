@@ -1,10 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, Menu,messagebox
 from datetime import datetime
-from PIL import Image, ImageTk
+from ImageCache import get_photo
 from DataLoaders import CustomerSide, CustomerCheckout
+from Cart import Cart, to_paise
+from Storage import get_storage
+from TkExecutor import BusyState, run_in_background
 import math
 
+MENU_CHECK_MS = 2000  # How often open customer windows look for menu edits
+
 class RestaurantApp:
     def __init__(self, root: tk.Tk, username):
         self.root = root
@@ -18,10 +23,14 @@ class RestaurantApp:
 
         # Data
         self.DL = CustomerSide('menu_items.csv')
+        self.catalog = self.DL.catalog
         self.menu_items = self.DL.items
         self.menu_items_linear = self.DL.items_linear
-        self.qtyvars = [{'Name':a['Name'], "QtyVar": tk.IntVar(root, 0),'Price':0, 'Qty': 0} for a in self.menu_items_linear]
+        self.cart = Cart()
+        self.qtyvars = {}  # name -> quantity IntVar of the cards currently shown
+        self.cards = {}    # name -> card Frame currently shown
         self.order = []
+        self.checking_out = False  # An order is being saved in the background
         # Create the header bar
         self.create_header()
 
@@ -48,6 +57,9 @@ class RestaurantApp:
         buttonframe.grid(row = 3, sticky='e')
         self.create_checkout_button()
 
+        # Pick up menu edits made while this window is open
+        self.root.after(MENU_CHECK_MS, self.check_menu_updates)
+
     def create_header(self):
         # Header frame
         header_frame = ttk.Frame(self.root)
@@ -81,6 +93,8 @@ class RestaurantApp:
         # Clear the notebook when a new category is selected
         for tab in self.notebook.tabs():
             self.notebook.forget(tab)
+        self.qtyvars = {}
+        self.cards = {}
 
         # Get the selected category's items
         selected_category = self.category_var.get()
@@ -101,7 +115,6 @@ class RestaurantApp:
             end = start + items_per_tab
             for j, item in enumerate(self.items[start:end]):
                 self.create_item_card(tab_frame, item)
-        self.update_order()
 
     def clear_focus(self, event):
         # Get the widget that was clicked
@@ -118,16 +131,10 @@ class RestaurantApp:
         item_type = item['Type']
         frame = tk.Frame(parent, bg="white", bd=2, relief=tk.GROOVE)
         frame.pack(fill=tk.X, padx=10, pady=5)
+        self.cards[name] = frame
 
-        # Load the appropriate icon based on item type (veg or non-veg)
-        if item_type == "Vegetarian":
-            veg_icon = Image.open("veg.png")
-            veg_icon = veg_icon.resize((20, 20), Image.LANCZOS)
-            icon = ImageTk.PhotoImage(veg_icon)
-        else:
-            non_veg_icon = Image.open("nonveg.png")
-            non_veg_icon = non_veg_icon.resize((20, 20), Image.LANCZOS)
-            icon = ImageTk.PhotoImage(non_veg_icon)
+        # Load the appropriate icon based on item type (veg or non-veg), decoded once and shared
+        icon = get_photo("veg.png" if item_type == "Vegetarian" else "nonveg.png", (20, 20))
 
         # Store the icon reference to prevent garbage collection
         frame.icon_image = icon
@@ -153,19 +160,18 @@ class RestaurantApp:
         price_label = tk.Label(frame, text=f"₹{price}", bg="white", font=("Arial", 14), anchor='e')
         price_label.grid(row=0, column=2, rowspan=1, sticky="e", padx=10, pady=10)
 
+        # Keep the labels a menu update may need to change
+        frame.icon_label = item_icon
+        frame.description_label = item_description
+        frame.price_label = price_label
+
         quantity_label = tk.Label(frame, text="Quantity:", bg="white")
         quantity_label.grid(row=1, column=0, columnspan=2, sticky="E", pady=10)
 
-        qty = tk.IntVar(frame, 0)
-        for element in self.qtyvars:
-            if element['Name']==name:
-                if element['Qty'] == 0:
-                    element['QtyVar'] = qty
-                    element['Price'] = price
-                else:
-                    qty = tk.IntVar(frame, element['Qty'])
-                    element["QtyVar"] = qty
-                    element['Price'] = price
+        # The quantity starts from what is already in the cart and keeps the cart up to date
+        qty = tk.IntVar(frame, self.cart.qty(name))
+        qty.trace_add('write', lambda *args: self.on_qty_change(name, qty))
+        self.qtyvars[name] = qty
         quantity_spinbox = tk.Spinbox(frame, from_=0, to=10, width=5, state='readonly', textvariable=qty)
         quantity_spinbox.grid(row=1, column=2, sticky="e", padx=10, pady=10)
 
@@ -179,6 +185,11 @@ class RestaurantApp:
         canvas = tk.Canvas(checkout_frame, highlightthickness=0, width=150, height=50)  # Set canvas to button size
         canvas.pack(side="right", padx=(0, 20), pady=(0, 10))  # Reduced padding
 
+        # Shown while the order is being saved
+        busy_label = tk.Label(checkout_frame, fg="gray")
+        busy_label.pack(side="right", padx=10)
+        self.busy = BusyState(busy_label, "Placing order...")
+
         # Function to create rounded rectangle
         def create_rounded_rectangle(x1, y1, x2, y2, radius=25, **kwargs):
         
@@ -224,10 +235,10 @@ class RestaurantApp:
 
             # Revert the button appearance
             def on_release(event):
-                self.update_order()
-                
                 canvas.itemconfig(button, fill="blue")
-                if len([a for a in self.qtyvars if a['QtyVar'].get()>0])==0:
+                if self.checking_out:
+                    return  # The last order is still being saved
+                if self.cart.is_empty():
                     messagebox.showerror('No Item Sected', 'Please select at least one item to proceed.')
                 else:
                     self.on_checkout()
@@ -240,28 +251,118 @@ class RestaurantApp:
 
 
 
-    def update_order(self):
-        for a in self.qtyvars:
-            a['Qty'] = a["QtyVar"].get()
+    def on_qty_change(self, name, qty):
+        item = self.catalog.by_name.get(name)
+        if item is None:
+            return  # Taken off the menu
+        try:
+            self.cart.set_qty(name, to_paise(item['Price']), qty.get())
+        except tk.TclError:
+            pass  # Not a number (yet)
+
+    def check_menu_updates(self):
+        """Applies menu edits saved since the last check. The catalog is cached until the
+        menu changes, so this is cheap to run every few seconds. The check itself runs
+        on a worker thread."""
+        run_in_background(self.root, get_storage().load_catalog,
+                          on_done=self.on_menu_checked, on_error=self.on_menu_check_error)
+
+    def on_menu_checked(self, catalog):
+        if catalog is not self.catalog:
+            self.apply_menu_changes(self.catalog, catalog)
+        self.root.after(MENU_CHECK_MS, self.check_menu_updates)
+
+    def on_menu_check_error(self, error):
+        print(f"Error reading the menu: {error}")
+        self.root.after(MENU_CHECK_MS, self.check_menu_updates)
+
+    def apply_menu_changes(self, old, new):
+        """Updates only the cards and cart lines of items that changed between two
+        menu snapshots, instead of rebuilding the notebook."""
+        self.catalog = new
+        self.menu_items = new.by_category
+        self.category_combobox['values'] = list(self.menu_items.keys())
+        selected = self.category_var.get()
+        if selected not in self.menu_items:
+            # The category on screen is gone altogether; fall back to the first one
+            for name in [name for name in old.by_name if name not in new.by_name]:
+                self.cart.set_qty(name, 0, 0)
+            if self.menu_items:
+                self.category_combobox.set(next(iter(self.menu_items)))
+                self.load_category(None)
+            return
+        self.items = self.menu_items[selected]
+
+        dropped = []
+        for name, item in old.by_name.items():
+            if name not in new.by_name:
+                if self.cart.qty(name) > 0:
+                    dropped.append(name)
+                self.cart.set_qty(name, 0, 0)
+                self.remove_item_card(name)
+        for name, item in new.by_name.items():
+            old_item = old.by_name.get(name)
+            if old_item == item:
+                continue
+            if old_item is not None and self.cart.qty(name) > 0 and old_item['Price'] != item['Price']:
+                self.cart.set_qty(name, to_paise(item['Price']), self.cart.qty(name))
+            if item['Category'] != selected:
+                self.remove_item_card(name)
+            elif name in self.cards:
+                self.update_item_card(self.cards[name], item)
+            else:
+                self.add_item_card(item)
+
+        if dropped:
+            messagebox.showinfo("Menu Updated", "These items are no longer served and were removed from your order:\n" + "\n".join(dropped))
+
+    def update_item_card(self, frame, item):
+        icon = get_photo("veg.png" if item['Type'] == "Vegetarian" else "nonveg.png", (20, 20))
+        frame.icon_image = icon
+        frame.icon_label.config(image=icon)
+        frame.description_label.config(text=item['Description'])
+        frame.price_label.config(text=f"₹{item['Price']}")
+
+    def remove_item_card(self, name):
+        frame = self.cards.pop(name, None)
+        if frame is not None:
+            self.qtyvars.pop(name, None)
+            frame.destroy()
+
+    def add_item_card(self, item, items_per_tab=5):
+        """Adds a card for a new item to the last page, opening a new page if it is full."""
+        tabs = self.notebook.tabs()
+        tab_frame = self.notebook.nametowidget(tabs[-1]) if tabs else None
+        if tab_frame is None or len(tab_frame.pack_slaves()) >= items_per_tab:
+            tab_frame = ttk.Frame(self.notebook)
+            self.notebook.add(tab_frame, text=f"Page {len(tabs) + 1}")
+            tab_frame.columnconfigure(0, weight=1)
+        self.create_item_card(tab_frame, item)
 
     def on_checkout(self):
         checkout = CustomerCheckout(self.user)
-        contents = [{a['Name']: a['Qty']} for a in self.qtyvars if a['QtyVar'].get() > 0]
-        
-        total = 0
-        for a in self.qtyvars:
-            if a['QtyVar'].get() > 0:
-                total += float(a['Price']) * a['Qty']
-        
-        # Append order to CSV
-        checkout.append_order_to_csv(contents, status="Pending", total=total)
-
+        contents = self.cart.contents()
+        total = self.cart.total()
+        prices = self.cart.prices()
+
+        # Append order to CSV on a worker thread; the window stays responsive meanwhile
+        self.checking_out = True
+        run_in_background(self.root, lambda: checkout.append_order_to_csv(contents, status="Pending", total=total, prices=prices),
+                          on_done=lambda result: self.on_order_placed(contents, total),
+                          on_error=self.on_checkout_error, busy=self.busy)
+
+    def on_order_placed(self, contents, total):
+        self.checking_out = False
         # Prepare order details for the popup
         order_details = "\n".join(f"{list(item.keys())[0]}: {list(item.values())[0]}x" for item in contents)
         messagebox.showinfo("Checkout Successful", f"Order Details:\n{order_details}\n\nTotal Price: ₹{total:.2f}")
-        for qtyvar in self.qtyvars:
-            qtyvar['QtyVar'].set(0)
-            qtyvar['Qty'] = 0
+        self.cart.clear()
+        for qtyvar in self.qtyvars.values():
+            qtyvar.set(0)
+
+    def on_checkout_error(self, error):
+        self.checking_out = False
+        messagebox.showerror("Checkout Failed", f"Could not place the order: {str(error)}")
 
 
 
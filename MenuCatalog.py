@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import os
+import threading
+from FileOps import atomic_write_text
+
+MENU_FILE = 'menu_items.csv'
+MENU_FIELDS = ["Category", "Name", "Price", "Description", "Type"]
+ID_FIELD = "ID"  # Stable item ID, the last column; assigned on read where missing
+
+
+class MenuCatalog:
+    """Parsed snapshot of the menu file with the indexes both sides need.
+
+    rows         - [(Category, Name, Price, Description, Type)] in file order
+    ids          - stable item ID of each row, in the same order
+    items        - [{field: value}] in file order
+    categories   - category names in order of first appearance
+    by_category  - {category: [item without its 'Category' key]} (customer side)
+    by_name      - {name: item}
+    The snapshot is shared between windows, so treat it as read-only."""
+
+    def __init__(self, rows, ids):
+        self.rows = rows
+        self.ids = ids
+        self.items = [dict(zip(MENU_FIELDS, row)) for row in rows]
+        self.categories = []
+        self.by_category = {}
+        self.by_name = {}
+        for item in self.items:
+            self.by_name[item['Name']] = item
+            category = item['Category']
+            if len(category) > 0:
+                if category not in self.by_category:
+                    self.categories.append(category)
+                    self.by_category[category] = []
+                self.by_category[category].append({k: v for k, v in item.items() if k != 'Category'})
+
+
+def read_menu_rows(path):
+    """Returns (rows, ids). Rows without an ID (menus written before IDs existed,
+    or lines added by hand) get the next free one; they keep it once the editor
+    saves the menu."""
+    rows = []
+    ids = []
+    with open(path, 'r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # Skip the header row
+        for row in reader:
+            # Skip empty lines
+            if not row or len(row) < len(MENU_FIELDS):
+                continue
+            rows.append(tuple(row[:len(MENU_FIELDS)]))
+            ids.append(row[len(MENU_FIELDS)] if len(row) > len(MENU_FIELDS) else '')
+    next_id = next_item_id(ids)
+    for i, item_id in enumerate(ids):
+        if not item_id:
+            ids[i] = str(next_id)
+            next_id += 1
+    return rows, ids
+
+
+def next_item_id(ids):
+    return max((int(item_id) for item_id in ids if item_id.isdigit()), default=0) + 1
+
+
+def write_menu_rows(path, rows, ids):
+    """Replaces the menu file with the given rows and their IDs in one atomic write."""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(MENU_FIELDS + [ID_FIELD])
+    for row, item_id in zip(rows, ids):
+        writer.writerow(list(row) + [item_id])
+    atomic_write_text(path, text.getvalue())
+
+
+_snapshots = {}  # path -> ((mtime_ns, size), MenuCatalog)
+_lock = threading.Lock()
+
+
+def load_catalog(path=MENU_FILE):
+    """Returns the MenuCatalog for the menu file, parsing the CSV only when needed.
+
+    The snapshot is validated by the file's mtime and size: first against the
+    copy held in this process, then against the JSON sidecar next to the file
+    (menu_items.csv.cache), which is cheaper to load than the CSV is to parse.
+    The sidecar is plain data, so a tampered one can at worst hold a wrong menu,
+    never run code. Raises FileNotFoundError if the menu file does not exist."""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _snapshots.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        sidecar = path + '.cache'
+        rows = None
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as file:
+                saved = json.load(file)
+            if saved['key'] == list(key) and len(saved['rows']) == len(saved['ids']):
+                rows, ids = [tuple(row) for row in saved['rows']], saved['ids']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        if rows is None:
+            rows, ids = read_menu_rows(path)
+            try:
+                temp_path = f"{sidecar}.tmp{os.getpid()}"
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    json.dump({'key': list(key), 'rows': rows, 'ids': ids}, file, separators=(',', ':'))
+                os.replace(temp_path, sidecar)
+            except OSError as e:
+                print(f"Error saving {sidecar}: {e}")
+
+        catalog = MenuCatalog(rows, ids)
+        _snapshots[path] = (key, catalog)
+        return catalog
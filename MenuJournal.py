@@ -0,0 +1,140 @@
+import json
+import os
+from FileOps import atomic_write_text
+from MenuCatalog import MENU_FILE
+
+# A command is a dict; its inverse is another command, so undo and redo are both
+# "apply this command", whatever the size of the menu:
+#   {'op': 'insert', 'items': [{'id', 'row', 'prev', 'next'}]}  - add / undo of delete
+#   {'op': 'remove', 'items': [{'id', 'row', 'prev', 'next'}]}  - delete / undo of add
+#   {'op': 'edit', 'id', 'old', 'new'}
+#   {'op': 'batch', 'commands': [command]}                     - bulk import
+# 'prev' / 'next' are the IDs of the item's neighbours when it was added or
+# removed, used to put it back in the same place.
+
+
+def inverse(command):
+    if command['op'] == 'batch':
+        return {'op': 'batch', 'commands': [inverse(c) for c in reversed(command['commands'])]}
+    if command['op'] == 'edit':
+        return {'op': 'edit', 'id': command['id'], 'old': command['new'], 'new': command['old']}
+    return {'op': 'remove' if command['op'] == 'insert' else 'insert', 'items': command['items']}
+
+
+def command_ids(command):
+    if command['op'] == 'batch':
+        return [item_id for c in command['commands'] for item_id in command_ids(c)]
+    if command['op'] == 'edit':
+        return [command['id']]
+    return [item['id'] for item in command['items']]
+
+
+class MenuJournal:
+    """Append-only journal of menu edits, kept next to the menu file
+    (menu_items.csv.journal), so undo / redo history survives closing the editor.
+
+    Each line is one JSON record: {"do": command}, {"undo": 1}, {"redo": 1}, or
+    {"checkpoint": 1, "through": n} once the menu file holds the edits in the
+    first n records (every record before it, if "through" is missing). Edits are
+    journaled (and fsynced) as they happen, while the menu file is only rewritten
+    now and then; edits after the last checkpoint are replayed when the editor
+    opens. Commands are idempotent, so replaying one already in the file is harmless."""
+
+    def __init__(self, path=MENU_FILE + '.journal', max_entries=200):
+        self.path = path
+        self.max_entries = max_entries
+        self.undo_stack = []
+        self.redo_stack = []
+        self.lines = 0
+
+    def load(self):
+        """Rebuilds the undo / redo stacks and returns the commands to apply,
+        in order, for edits the menu file does not hold yet."""
+        self.undo_stack = []
+        self.redo_stack = []
+        self.lines = 0
+        pending = []  # (record number, command)
+        try:
+            with open(self.path, 'r') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # Torn write at the end of the journal
+                    number = self.lines
+                    self.lines += 1
+                    if 'do' in record:
+                        command = record['do']
+                        self.undo_stack.append(command)
+                        self.redo_stack.clear()
+                        pending.append((number, command))
+                    elif 'undo' in record and self.undo_stack:
+                        command = self.undo_stack.pop()
+                        self.redo_stack.append(command)
+                        pending.append((number, inverse(command)))
+                    elif 'redo' in record and self.redo_stack:
+                        command = self.redo_stack.pop()
+                        self.undo_stack.append(command)
+                        pending.append((number, command))
+                    elif 'checkpoint' in record:
+                        through = record.get('through', number)
+                        pending = [(n, command) for n, command in pending if n >= through]
+        except FileNotFoundError:
+            pass
+        return [command for _, command in pending]
+
+    def append(self, record):
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self.lines += 1
+
+    def record(self, command):
+        """Journals a new edit; it can be undone, and clears what could be redone."""
+        self.append({'do': command})
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+
+    def undo(self):
+        """Returns the command that undoes the last edit, or None if there is none."""
+        if not self.undo_stack:
+            return None
+        self.append({'undo': 1})
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        return inverse(command)
+
+    def redo(self):
+        """Returns the command that redoes the last undone edit, or None if there is none."""
+        if not self.redo_stack:
+            return None
+        self.append({'redo': 1})
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        return command
+
+    def checkpoint(self, through=None):
+        """Notes that the menu file now holds the edits in the first `through` records
+        (all of them by default); the menu may have been written in the background
+        while more were journaled. When the journal has grown well past max_entries,
+        and nothing is left unsaved, it is rewritten with just the history kept."""
+        if through is None:
+            through = self.lines
+        if through == self.lines and self.lines > 2 * self.max_entries:
+            self.compact()
+        else:
+            self.append({'checkpoint': 1, 'through': through})
+
+    def compact(self):
+        self.undo_stack = self.undo_stack[-self.max_entries:]
+        records = [{'do': command} for command in self.undo_stack]
+        records += [{'do': command} for command in reversed(self.redo_stack)]
+        records += [{'undo': 1}] * len(self.redo_stack)
+        records.append({'checkpoint': 1})
+        atomic_write_text(self.path, ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self.lines = len(records)
+
+    def ids(self):
+        """Item IDs referred to by the history, so new items never reuse one."""
+        return [item_id for command in self.undo_stack + self.redo_stack for item_id in command_ids(command)]
@@ -0,0 +1,154 @@
+import csv
+import json
+import os
+from decimal import Decimal, InvalidOperation
+from MenuCatalog import MENU_FIELDS, ID_FIELD
+
+FOOD_TYPES = ("Vegetarian", "Non-Vegetarian")
+FILE_TYPES = [("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"), ("JSON files", "*.json")]
+
+
+def read_records(path):
+    """Yields (line or record number, {field: value}) from a CSV, JSON Lines or JSON
+    file, one record at a time. JSON files hold a list of objects; JSON Lines and
+    CSV files are never loaded whole."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+        if extension == '.json':
+            for number, record in enumerate(json.load(file), 1):
+                yield number, record
+        elif extension == '.jsonl':
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as e:
+                        yield number, ValueError(f"not valid JSON ({e})")
+        else:
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record
+
+
+def validate_record(record):
+    """Returns (row, item ID or '') for an imported record, or raises ValueError
+    saying what is wrong with it."""
+    if isinstance(record, ValueError):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("not an object with menu fields")
+    values = {}
+    for field in MENU_FIELDS:
+        value = record.get(field)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            raise ValueError(f"{field} is missing")
+        values[field] = value
+    try:
+        price = Decimal(values['Price'])
+    except InvalidOperation:
+        raise ValueError(f"Price {values['Price']!r} is not a number")
+    if not price.is_finite() or price < 0:
+        raise ValueError(f"Price {values['Price']!r} is not a valid price")
+    if values['Type'] not in FOOD_TYPES:
+        raise ValueError(f"Type must be one of {', '.join(FOOD_TYPES)}, not {values['Type']!r}")
+    item_id = record.get(ID_FIELD)
+    return tuple(values[field] for field in MENU_FIELDS), '' if item_id is None else str(item_id).strip()
+
+
+def merge_records(rows, ids, records, next_id):
+    """Merges validated (row, ID) records into the menu.
+
+    A record updates the item with the same ID, else the item with the same name,
+    and is added after the last item of its category otherwise (new categories go
+    at the end). An item whose category changes is moved after the last item of
+    its new category the same way, so every category stays one block. Later
+    records win over earlier ones for the same item.
+    Returns (rows, ids, journal command, added, updated, next_id); the command
+    is None if nothing changed."""
+    by_id = {item_id: i for i, item_id in enumerate(ids)}
+    by_name = {row[1]: i for i, row in enumerate(rows)}
+    merged = list(rows)
+    new_by_name = {}  # name -> [id, row], in file order
+    for row, item_id in records:
+        index = by_id.get(item_id) if item_id else None
+        if index is None:
+            index = by_name.get(row[1])
+        if index is not None:
+            merged[index] = row
+            continue
+        if row[1] in new_by_name:
+            new_by_name[row[1]][1] = row
+            continue
+        new_by_name[row[1]] = [str(next_id), row]
+        next_id += 1
+    new_items = {}  # category -> [[id, row]], by each item's final category
+    for item in new_by_name.values():
+        new_items.setdefault(item[1][0], []).append(item)
+
+    # Items changing category are taken out (remembering their place, for undo)
+    # and laid out again with the new items
+    moved = [i for i in range(len(rows)) if merged[i][0] != rows[i][0]]
+    moved_set = set(moved)
+    kept = [i for i in range(len(rows)) if i not in moved_set]
+    edits = [{'op': 'edit', 'id': ids[i], 'old': list(rows[i]), 'new': list(merged[i])}
+             for i in kept if tuple(merged[i]) != tuple(rows[i])]
+    # Undo puts them back in menu order, so 'prev' may be another moved item (back by
+    # then) but 'next' has to be one that stays
+    next_kept = {}
+    following = ''
+    for i in range(len(rows) - 1, -1, -1):
+        next_kept[i] = following
+        if i not in moved_set:
+            following = ids[i]
+    removes = [{'id': ids[i], 'row': list(rows[i]), 'prev': ids[i - 1] if i > 0 else '', 'next': next_kept[i]}
+               for i in moved]
+    placed = {}  # category -> [[id, row]]: moved items, then new ones
+    for i in moved:
+        placed.setdefault(merged[i][0], []).append([ids[i], merged[i]])
+    for category, items in new_items.items():
+        placed.setdefault(category, []).extend(items)
+
+    # Lay them out after the last kept item of their category; new categories come
+    # last, after the items joining the menu's last category
+    last_of_category = {merged[i][0]: k for k, i in enumerate(kept)}
+    after = {}
+    for category, items in sorted(placed.items(), key=lambda entry: entry[0] not in last_of_category):
+        after.setdefault(last_of_category.get(category, len(kept) - 1), []).extend(items)
+    out_rows = []
+    out_ids = []
+    inserts = []
+    for k in range(-1, len(kept)):
+        if k >= 0:
+            out_rows.append(merged[kept[k]])
+            out_ids.append(ids[kept[k]])
+        for item_id, row in after.get(k, ()):
+            inserts.append({'id': item_id, 'row': list(row), 'prev': out_ids[-1] if out_ids else '', 'next': ''})
+            out_rows.append(row)
+            out_ids.append(item_id)
+
+    commands = edits + ([{'op': 'remove', 'items': removes}] if removes else [])
+    commands += [{'op': 'insert', 'items': inserts}] if inserts else []
+    command = {'op': 'batch', 'commands': commands} if commands else None
+    return out_rows, out_ids, command, len(inserts) - len(moved), len(edits) + len(moved), next_id
+
+
+def export_items(path, rows, ids):
+    """Writes the menu to a CSV, JSON Lines or JSON file, one item at a time."""
+    extension = os.path.splitext(path)[1].lower()
+    fields = MENU_FIELDS + [ID_FIELD]
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        if extension in ('.json', '.jsonl'):
+            separator = '[\n' if extension == '.json' else ''
+            for row, item_id in zip(rows, ids):
+                file.write(separator + json.dumps(dict(zip(fields, list(row) + [item_id])), ensure_ascii=False))
+                separator = ',\n' if extension == '.json' else '\n'
+            if extension == '.json':
+                file.write('\n]\n' if rows else '[]\n')
+            elif rows:
+                file.write('\n')
+        else:
+            writer = csv.writer(file)
+            writer.writerow(fields)
+            for row, item_id in zip(rows, ids):
+                writer.writerow(list(row) + [item_id])
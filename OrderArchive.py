@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import numpy as np
+from Storage import get_storage
+from OrderContents import decode_order_or_empty, placed_at_from_order_id
+
+ARCHIVE_DIR = 'order_archive'
+
+# Column name -> dtype. Order columns have one entry per order; item columns one
+# entry per line item, with item_order pointing at the order row it belongs to.
+ORDER_COLUMNS = {'placed_at': np.int64, 'customer': np.int32, 'total': np.float64}
+ITEM_COLUMNS = {'item_order': np.int32, 'item': np.int32, 'item_qty': np.int32, 'item_price': np.float64}
+
+
+class OrderArchive:
+    """Columnar archive of closed orders: one .npy file per column, memory-mapped
+    when opened, so history-wide scans are plain NumPy array operations.
+
+    Customer and item names are stored once in names.json (its "customers" and
+    "items" lists) and referred to by int32 codes. item_price is NaN where the order did not record
+    a unit price (orders placed before prices were stored with the line items)."""
+
+    def __init__(self, path=ARCHIVE_DIR):
+        self.path = path
+        self.columns = {}
+        self.order_ids = np.empty(0, dtype='U1')
+        self.customers = []
+        self.items = []
+        if os.path.isdir(path):
+            self.load()
+        else:
+            for name, dtype in {**ORDER_COLUMNS, **ITEM_COLUMNS}.items():
+                self.columns[name] = np.empty(0, dtype=dtype)
+
+    def load(self):
+        for name in list(ORDER_COLUMNS) + list(ITEM_COLUMNS):
+            self.columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+        self.order_ids = np.load(os.path.join(self.path, 'order_ids.npy'), mmap_mode='r')
+        with open(os.path.join(self.path, 'names.json'), 'r') as file:
+            names = json.load(file)
+        self.customers = names['customers']
+        self.items = names['items']
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def append(self, orders):
+        """Writes a new archive holding the current contents plus the given orders
+        (dicts with OrderID, CustomerID, Contents (raw), Total), then swaps it in."""
+        customer_codes = {name: i for i, name in enumerate(self.customers)}
+        item_codes = {name: i for i, name in enumerate(self.items)}
+        customers = list(self.customers)
+        items = list(self.items)
+        new = {name: [] for name in list(ORDER_COLUMNS) + list(ITEM_COLUMNS)}
+        new_ids = []
+        row = len(self)
+        for order in orders:
+            line_items, placed_at = decode_order_or_empty(order['Contents'], order['OrderID'])
+            if placed_at is None:
+                placed_at = placed_at_from_order_id(order['OrderID']) or 0
+            customer = order['CustomerID']
+            if customer not in customer_codes:
+                customer_codes[customer] = len(customers)
+                customers.append(customer)
+            new_ids.append(order['OrderID'])
+            new['placed_at'].append(placed_at)
+            new['customer'].append(customer_codes[customer])
+            new['total'].append(float(order['Total']))
+            for line in line_items:
+                name = line[0]
+                if name not in item_codes:
+                    item_codes[name] = len(items)
+                    items.append(name)
+                new['item_order'].append(row)
+                new['item'].append(item_codes[name])
+                new['item_qty'].append(int(line[1]))
+                new['item_price'].append(float(line[2]) if len(line) > 2 else np.nan)
+            row += 1
+
+        temp_path = self.path + '.tmp'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for name, dtype in {**ORDER_COLUMNS, **ITEM_COLUMNS}.items():
+            column = np.concatenate([np.asarray(self.columns[name], dtype=dtype), np.array(new[name], dtype=dtype)])
+            np.save(os.path.join(temp_path, f"{name}.npy"), column)
+        np.save(os.path.join(temp_path, 'order_ids.npy'), np.concatenate([np.asarray(self.order_ids), np.array(new_ids, dtype=str)]))
+        with open(os.path.join(temp_path, 'names.json'), 'w') as file:
+            json.dump({'customers': customers, 'items': items}, file)
+
+        # Drop the memory maps before replacing the files they point at
+        self.columns = {}
+        self.order_ids = None
+        old_path = self.path + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.isdir(self.path):
+            os.rename(self.path, old_path)
+        os.rename(temp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        self.load()
+
+
+def archive_closed_orders(statuses=('Delivered',), path=ARCHIVE_DIR):
+    """Adds the closed orders of orders.csv that are not archived yet to the
+    columnar archive and returns how many were added. The rows are found through
+    the status index, so only they are read from storage."""
+    archive = OrderArchive(path)
+    archived = set(archive.order_ids.tolist())
+    storage = get_storage()
+    order_ids = [order_id for order_id in storage.ids_with_status(*statuses) if order_id not in archived]
+    if order_ids:
+        archive.append(storage.read_orders(order_ids, decode=False))
+    return len(order_ids)
+
+
+if __name__ == "__main__":
+    print(f"Archived {archive_closed_orders()} orders")
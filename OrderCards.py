@@ -0,0 +1,214 @@
+import tkinter as tk
+from tkinter import ttk
+from TkExecutor import run_in_background
+
+
+def card_signature(order):
+    """The parts of an order a card shows; the card is only updated when these change."""
+    return (order['CustomerID'], order['Status'], order['Total'], repr(order['Contents']))
+
+
+class KeyedCards:
+    """Order card widgets keyed by OrderID, created once and updated in place."""
+
+    def __init__(self, parent, create_card, update_card):
+        self.parent = parent
+        self.create_card = create_card  # (parent, order) -> card Frame, not yet packed
+        self.update_card = update_card  # (card, order) -> None
+        self.cards = {}       # OrderID -> card Frame
+        self.signatures = {}  # OrderID -> card_signature of what the card shows
+
+    def materialize(self, order):
+        """Returns the card for the order, creating it or updating it only if needed."""
+        key = order['OrderID']
+        signature = card_signature(order)
+        if key not in self.cards:
+            self.cards[key] = self.create_card(self.parent, order)
+        elif self.signatures[key] != signature:
+            self.update_card(self.cards[key], order)
+        self.signatures[key] = signature
+        return self.cards[key]
+
+    def discard_except(self, keys):
+        """Destroys every card whose OrderID is not in keys."""
+        for key in [key for key in self.cards if key not in keys]:
+            self.cards.pop(key).destroy()
+            del self.signatures[key]
+
+
+class OrderCardPages:
+    """Spreads order cards over the pages of a Notebook, keeping one card per OrderID
+    alive across refreshes.
+
+    render() works out the difference from what is on screen: cards of orders that
+    disappeared are destroyed, new orders get new cards, cards whose data changed
+    are updated in place, and cards that only moved to another page are re-packed
+    there. Cards are children of the Notebook and packed into a page with `in_`,
+    which is what lets them move between pages without being recreated."""
+
+    def __init__(self, notebook, create_card, update_card, per_page):
+        self.notebook = notebook
+        self.per_page = per_page
+        self.cards = KeyedCards(notebook, create_card, update_card)
+        self.pages = []       # page Frames, in tab order
+        self.layout = []      # OrderIDs packed on each page
+
+    def render(self, orders):
+        keys = [order['OrderID'] for order in orders]
+
+        # Destroy the cards of orders that are gone, create new ones, update changed ones
+        self.cards.discard_except(set(keys))
+        for order in orders:
+            self.cards.materialize(order)
+
+        self.resize_pages((len(keys) + self.per_page - 1) // self.per_page)
+
+        # Re-pack only the pages whose cards changed; forget everything first so a
+        # card moving from one page to another is not forgotten after being packed
+        new_layout = [keys[i * self.per_page:(i + 1) * self.per_page] for i in range(len(self.pages))]
+        changed = [i for i in range(len(self.pages)) if new_layout[i] != self.layout[i]]
+        for i in changed:
+            for key in self.layout[i]:
+                if key in self.cards.cards:
+                    self.cards.cards[key].pack_forget()
+        for i in changed:
+            for key in new_layout[i]:
+                card = self.cards.cards[key]
+                card.pack(in_=self.pages[i], fill=tk.X, padx=10, pady=5)
+                card.lift(self.pages[i])
+            self.layout[i] = new_layout[i]
+
+    def resize_pages(self, num_pages):
+        """Adds or removes Notebook pages at the end so there are exactly num_pages."""
+        while len(self.pages) < num_pages:
+            page = ttk.Frame(self.notebook)
+            self.notebook.add(page, text=f"Page {len(self.pages) + 1}")
+            page.columnconfigure(0, weight=1)
+            self.pages.append(page)
+            self.layout.append([])
+        while len(self.pages) > num_pages:
+            page = self.pages.pop()
+            self.layout.pop()
+            self.notebook.forget(page)
+            page.destroy()
+
+
+class PagedOrderCards(ttk.Frame):
+    """Shows one page of order cards at a time with a page navigator underneath.
+
+    Only the OrderIDs are held for the whole list; the orders of a page are fetched
+    in the background and their cards built when they arrive, and the neighbouring
+    page in the direction of travel is prefetched once Tk is idle. Cards of any
+    other page are destroyed, so the cost does not grow with the number of pages.
+    A fetch that arrives after another page was asked for is dropped."""
+
+    def __init__(self, parent, fetch_orders, create_card, update_card, per_page, busy=None):
+        super().__init__(parent)
+        self.fetch_orders = fetch_orders  # [OrderID, ...] -> [order, ...], called on a worker thread
+        self.per_page = per_page
+        self.busy = busy
+        self.keys = []
+        self.page = 0
+        self.direction = 1
+        self.request = 0      # Bumped by every show_page, so stale fetches can be told apart
+        self.prefetched = {}  # OrderID -> order, for the prefetched page
+        self.prefetch_job = None
+
+        self.content = ttk.Frame(self)
+        self.content.pack(fill=tk.BOTH, expand=True)
+        self.content.columnconfigure(0, weight=1)
+        self.cards = KeyedCards(self.content, create_card, update_card)
+
+        # Page navigator
+        nav = ttk.Frame(self)
+        nav.pack(pady=(5, 0))
+        self.first_btn = tk.Button(nav, text="<<", command=lambda: self.show_page(0), relief='flat')
+        self.prev_btn = tk.Button(nav, text="<", command=lambda: self.show_page(self.page - 1), relief='flat')
+        self.page_var = tk.StringVar()
+        page_entry = tk.Entry(nav, textvariable=self.page_var, width=6, justify='center')
+        page_entry.bind("<Return>", self.on_page_entry)
+        self.total_label = tk.Label(nav)
+        self.next_btn = tk.Button(nav, text=">", command=lambda: self.show_page(self.page + 1), relief='flat')
+        self.last_btn = tk.Button(nav, text=">>", command=lambda: self.show_page(self.num_pages() - 1), relief='flat')
+        for widget in (self.first_btn, self.prev_btn, tk.Label(nav, text="Page"), page_entry,
+                       self.total_label, self.next_btn, self.last_btn):
+            widget.pack(side=tk.LEFT, padx=3)
+
+    def num_pages(self):
+        return max(1, (len(self.keys) + self.per_page - 1) // self.per_page)
+
+    def page_keys(self, page):
+        return self.keys[page * self.per_page:(page + 1) * self.per_page]
+
+    def set_keys(self, keys):
+        """Replaces the list of OrderIDs to page through and shows its first page."""
+        self.keys = keys
+        self.prefetched = {}
+        self.show_page(0)
+
+    def on_page_entry(self, event=None):
+        try:
+            self.show_page(int(self.page_var.get()) - 1)
+        except ValueError:
+            self.page_var.set(str(self.page + 1))
+
+    def show_page(self, page):
+        page = min(max(page, 0), self.num_pages() - 1)
+        self.direction = -1 if page < self.page else 1
+        self.page = page
+        self.request += 1
+        request = self.request
+        if self.prefetch_job is not None:
+            self.after_cancel(self.prefetch_job)
+            self.prefetch_job = None
+
+        keys = self.page_keys(page)
+        missing = [key for key in keys if key not in self.prefetched]
+        if not missing:
+            self.render_page(request, keys, [])
+            return
+        run_in_background(self, self.fetch_orders, missing,
+                          on_done=lambda fetched: self.render_page(request, keys, fetched), busy=self.busy)
+
+    def render_page(self, request, keys, fetched):
+        if request != self.request:
+            return  # Another page was asked for meanwhile; its own fetch is on the way
+        page = self.page
+        orders = {order['OrderID']: order for order in fetched}
+        orders.update((key, self.prefetched[key]) for key in keys if key in self.prefetched)
+
+        for card in self.content.pack_slaves():
+            card.pack_forget()
+        for key in keys:
+            if key in orders:
+                self.cards.materialize(orders[key]).pack(fill=tk.X, padx=10, pady=5)
+        self.cards.discard_except(set(keys))
+
+        self.page_var.set(str(page + 1))
+        self.total_label.config(text=f"of {self.num_pages()}")
+        self.first_btn.config(state="normal" if page > 0 else "disabled")
+        self.prev_btn.config(state="normal" if page > 0 else "disabled")
+        self.next_btn.config(state="normal" if page < self.num_pages() - 1 else "disabled")
+        self.last_btn.config(state="normal" if page < self.num_pages() - 1 else "disabled")
+
+        self.prefetch_job = self.after_idle(self.prefetch, page + self.direction)
+
+    def prefetch(self, page):
+        """Fetches the orders of the given page in the background and builds their cards
+        ahead of time, without showing them."""
+        self.prefetch_job = None
+        if not 0 <= page < self.num_pages():
+            return
+        request = self.request
+        keys = self.page_keys(page)
+        run_in_background(self, self.fetch_orders, keys,
+                          on_done=lambda fetched: self.store_prefetched(request, keys, fetched))
+
+    def store_prefetched(self, request, keys, fetched):
+        if request != self.request:
+            return  # The page changed meanwhile; its own prefetch follows
+        self.prefetched = {order['OrderID']: order for order in fetched}
+        for key in keys:
+            if key in self.prefetched:
+                self.cards.materialize(self.prefetched[key])
+        self.cards.discard_except(set(keys) | set(self.page_keys(self.page)))
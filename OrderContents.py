@@ -0,0 +1,96 @@
+import ast
+import json
+import time
+from datetime import datetime
+
+CONTENTS_VERSION = 2
+
+# What decoding a damaged or unsupported Contents value can raise
+DECODE_ERRORS = (SyntaxError, ValueError, KeyError, TypeError, IndexError)
+
+_reported = set()  # OrderIDs whose Contents could not be decoded, reported once each
+
+
+def encode_contents(contents, prices=None, placed_at=None):
+    """Encodes an order's line items for the Contents column.
+
+    contents is the usual list of single-key {name: qty} dictionaries and prices an
+    optional {name: unit price}. The result is compact JSON tagged with a version:
+        {"v":2,"t":<placed, epoch seconds>,"i":[["Nachos",2,180.0],...]}"""
+    prices = prices or {}
+    items = []
+    for item in contents:
+        name, qty = next(iter(item.items()))
+        line = [name, qty]
+        if name in prices:
+            line.append(float(prices[name]))
+        items.append(line)
+    placed_at = int(time.time()) if placed_at is None else placed_at
+    return json.dumps({'v': CONTENTS_VERSION, 't': placed_at, 'i': items}, separators=(',', ':'))
+
+
+def read_versioned(text):
+    """Returns (line items, placed_at) from a JSON Contents value, by its "v" tag.
+    Raises ValueError for a version this code does not know (e.g. written by a
+    newer release) rather than guessing at its layout."""
+    data = json.loads(text)
+    version = data.get('v') if isinstance(data, dict) else None
+    if version == 2:
+        return data['i'], data.get('t')
+    raise ValueError(f"Unsupported Contents version {version!r}")
+
+
+def decode_order(text):
+    """Returns (line items, placed_at) for a Contents value in either format.
+
+    Line items are [name, qty] or [name, qty, unit price] lists; placed_at is in
+    epoch seconds, or None for legacy rows, which only store str(list_of_dicts)."""
+    if text.startswith('{'):
+        return read_versioned(text)
+    # Legacy format; literal_eval is only reached for rows written before version 2
+    return [list(next(iter(item.items()))) for item in ast.literal_eval(text)], None
+
+
+def decode_contents(text):
+    """Decodes a Contents value into the list of single-key {name: qty} dictionaries the views use."""
+    if text.startswith('{'):
+        return [{line[0]: line[1]} for line in read_versioned(text)[0]]
+    return ast.literal_eval(text)
+
+
+def report_bad_contents(order_id, error):
+    if order_id not in _reported:
+        _reported.add(order_id)
+        print(f"Cannot decode the Contents of order {order_id}: {error}")
+
+
+def decode_contents_or_empty(text, order_id=''):
+    """decode_contents for readers going through many orders: a row that cannot be
+    decoded (an unknown version, a damaged legacy value) is reported and read as
+    having no items, so one bad row cannot stop the whole read."""
+    try:
+        return decode_contents(text)
+    except DECODE_ERRORS as e:
+        report_bad_contents(order_id, e)
+        return []
+
+
+def decode_order_or_empty(text, order_id=''):
+    """decode_order, with a row that cannot be decoded read as ([], None) like decode_contents_or_empty."""
+    try:
+        return decode_order(text)
+    except DECODE_ERRORS as e:
+        report_bad_contents(order_id, e)
+        return [], None
+
+
+def is_legacy(text):
+    return not text.startswith('{')
+
+
+def placed_at_from_order_id(order_id):
+    """Best guess at when a legacy order was placed: midnight of the ddmmyy its OrderID starts with."""
+    try:
+        return int(datetime.strptime(order_id[:6], "%d%m%y").timestamp())
+    except ValueError:
+        return None
@@ -0,0 +1,59 @@
+import os
+from FileOps import file_lock, atomic_write_text
+from OrderStore import get_order_store
+
+
+def order_number_of(order_id, today_date, username):
+    """Returns the order number of an OrderID in either the old ddmmyy{username}{n}
+    format or the current ddmmyy{username}-{n} format (0 if it is neither)."""
+    prefix = f"{today_date}{username}"
+    if not order_id.startswith(prefix):
+        return 0
+    number = order_id[len(prefix):].lstrip('-')
+    return int(number) if number.isdigit() else 0
+
+
+class OrderSequence:
+    """Per-user order number counter kept in {username}_orders.seq as 'ddmmyy n'.
+
+    Each allocation is a locked read and rewrite of that one small file, so it
+    costs the same however many orders the customer has placed, and two
+    checkouts racing for the same user always get different numbers."""
+
+    def __init__(self, username):
+        self.username = username
+        self.path = f"{username}_orders.seq"
+        self.lock_path = self.path + '.lock'
+
+    def next_number(self, today_date):
+        """Allocates and returns the next order number for the given day."""
+        with file_lock(self.lock_path):
+            date, number = self.read()
+            if date is None:
+                number = self.seed_from_orders(today_date)
+            elif date != today_date:
+                number = 0
+            number += 1
+            atomic_write_text(self.path, f"{today_date} {number}\n")
+        return number
+
+    def read(self):
+        try:
+            with open(self.path, 'r') as file:
+                date, number = file.read().split()
+            return date, int(number)
+        except FileNotFoundError:
+            return None, 0
+        except ValueError:
+            print(f"Error reading {self.path}, recounting today's orders")
+            return None, 0
+
+    def seed_from_orders(self, today_date):
+        """Starts the counter off from today's orders already on file (only done once,
+        when the counter file does not exist yet)."""
+        number = 0
+        user_file = f"{self.username}_orders.csv"
+        if os.path.isfile(user_file):
+            for order_id in get_order_store(user_file).ids_for_customer(self.username):
+                number = max(number, order_number_of(order_id, today_date, self.username))
+        return number
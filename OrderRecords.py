@@ -1,7 +1,10 @@
 import tkinter as tk
-from tkinter import ttk
 import DataLoaders as DL
-from PIL import Image, ImageTk
+from ImageCache import get_photo
+from OrderCards import PagedOrderCards
+from OrderSearch import DebouncedSearch
+from Storage import get_storage
+from TkExecutor import BusyState, run_in_background
 
 class OrderHistoryApp(tk.Toplevel):
     def __init__(self, root):
@@ -19,7 +22,8 @@ class OrderHistoryApp(tk.Toplevel):
         # Search Entry (Increased width)
         self.search_entry = tk.Entry(self, textvariable=self.search_var, width=30)  # Increased width
         self.search_entry.grid(row=0, column=0, padx=(10, 0), sticky='E', pady=10)
-        self.search_entry.bind("<KeyRelease>", self.on_search)  # Call the on_search method on key release
+        self.search_entry.bind("<KeyRelease>", lambda e: self.debounced_search.trigger())  # Search once typing pauses
+        self.debounced_search = DebouncedSearch(self, self.search_var, self.on_search)
 
         # Clear button (flat style)
         self.clear_button = tk.Button(self, text="X", command=self.clear_search, relief='flat')
@@ -28,71 +32,70 @@ class OrderHistoryApp(tk.Toplevel):
         self.done_btn = tk.Button(self, text="Done", command=self.on_closing, padx=10, pady=5, bg='#4CAF50', font=("Arial", 10, "bold"))
         self.done_btn.grid(row=0, sticky='w', column=2, padx=10, pady=10)
 
-        self.info_image = Image.open("i.png")
-        self.info_image = self.info_image.resize((30, 30), Image.LANCZOS)  # Resize if necessary
-        self.info_photo = ImageTk.PhotoImage(self.info_image)
+        self.info_photo = get_photo("i.png", (30, 30))  # Shared with the other windows
 
-        # Notebook for displaying orders
-        self.notebook = ttk.Notebook(self)
-        self.notebook.grid(row=1, column=0, padx=10, columnspan=3, pady=10, sticky='nsew')
+        # Shown while orders are read or searched in the background
+        self.busy_label = tk.Label(self, fg="gray")
+        self.busy_label.grid(row=2, column=0, columnspan=3, sticky='w', padx=10)
+        self.busy = BusyState(self.busy_label, "Loading orders...")
+
+        # Pages of order cards; only the page on screen (and the next one) is ever built
+        self.pager = PagedOrderCards(self, DL.read_orders_by_id, self.create_order_card, self.update_order_card, 6, self.busy)
+        self.pager.grid(row=1, column=0, padx=10, columnspan=3, pady=10, sticky='nsew')
         self.grid_rowconfigure(1, weight=1)
 
         # Load orders
-        self.orders = []
+        self.order_ids = []
         self.load_order_history()
 
     def load_order_history(self):
-        """Reads the orders and populates the UI with non-editable order history."""
-        self.orders = DL.read_orders_csv()[::-1]  # Read updated orders from file and reverse the order
-        self.populate_tabs(6)
-
-    def populate_tabs(self, orders_per_tab):
-        """Dynamically creates tabs and populates them with order cards."""
-        # Clear all tabs
-        for tab in self.notebook.tabs():
-            self.notebook.forget(tab)
-
-        filtered_orders = self.get_filtered_orders()
-
-        num_tabs = (len(filtered_orders) + orders_per_tab - 1) // orders_per_tab
-        for i in range(num_tabs):
-            tab_frame = ttk.Frame(self.notebook)
-            self.notebook.add(tab_frame, text=f"Page {i + 1}")
-            tab_frame.columnconfigure(0, weight=1)
-
-            start = i * orders_per_tab
-            end = start + orders_per_tab
-            for order in filtered_orders[start:end]:
-                self.create_order_card(tab_frame, order)
-
-    def get_filtered_orders(self):
-        """Returns a list of orders filtered by the search term."""
-        search_term = self.search_var.get().lower()
-        return [
-            order for order in self.orders
-            if search_term in str(order["OrderID"]).lower() or
-            search_term in order["CustomerID"].lower() or
-            any(search_term in item.lower() for item in [str(list(a.keys())[0]) for a in order['Contents']])
-        ]
+        """Reads the order IDs in the background, then shows the first page of the non-editable order history."""
+        run_in_background(self, DL.read_order_ids, on_done=self.show_order_history, busy=self.busy)
+
+    def show_order_history(self, order_ids):
+        self.order_ids = order_ids[::-1]  # Newest first
+        self.populate_pages(6)
+
+    def populate_pages(self, orders_per_page):
+        """Pages through the filtered orders, starting at the first page.
+        The search term is looked up in the background when there is one."""
+        self.pager.per_page = orders_per_page
+        query = self.search_var.get()
+        if not query.strip():
+            self.pager.set_keys(self.order_ids)
+            return
+        run_in_background(self, get_storage().search_orders, query,
+                          on_done=lambda matches: self.show_filtered_ids(query, matches), busy=self.busy)
+
+    def show_filtered_ids(self, query, matches):
+        if query != self.search_var.get():
+            return  # The search changed meanwhile; its own lookup is on the way
+        self.pager.set_keys(self.get_filtered_ids(matches))
+
+    def get_filtered_ids(self, matches):
+        """Returns the OrderIDs (newest first) among the search matches (all of them for no search)."""
+        if matches is None:
+            return self.order_ids
+        return matches[::-1]
 
     def on_search(self, event=None):
         """Handles the search input and updates the displayed orders."""
-        self.populate_tabs(6)  # Refresh tabs with the filtered results
+        self.populate_pages(6)  # Refresh pages with the filtered results
 
     def clear_search(self):
-        """Clears the search bar and repopulates the tabs with all orders."""
+        """Clears the search bar and shows all orders again."""
+        self.debounced_search.cancel()
         self.search_var.set("")
-        self.populate_tabs(6)
+        self.populate_pages(6)
 
     def create_order_card(self, parent, order):
-        """Creates a card for each order displaying its details (non-editable)."""
+        """Creates a card for an order displaying its details (non-editable); PagedOrderCards packs it into its page."""
         order_id = order["OrderID"]
         customer_id = order["CustomerID"]
-        contents = order["Contents"]
         status = order["Status"]
 
         frame = tk.Frame(parent, bg="white", bd=2, relief=tk.GROOVE)
-        frame.pack(fill=tk.X, padx=10, pady=5)
+        frame.order = order
 
         # Configure grid layout for alignment
         frame.grid_columnconfigure(0, weight=0)  # Left-aligned text
@@ -103,15 +106,24 @@ class OrderHistoryApp(tk.Toplevel):
         order_id_label = tk.Label(frame, text=f"Order ID: {order_id}", font=("Arial", 16, "bold"), bg="white")
         order_id_label.grid(row=0, column=0, sticky="w", padx=10, pady=(7, 0))
 
-        info_button = tk.Button(frame, image=self.info_photo, command=lambda: self.show_order_info(contents, order['Total']), relief='flat', background='white')
+        info_button = tk.Button(frame, image=self.info_photo, command=lambda: self.show_order_info(frame.order['Contents'], frame.order['Total']), relief='flat', background='white')
         info_button.grid(row=0, column=1, columnspan=2, padx=(3, 10), pady=(5, 0), sticky='w')
 
         custname_label = tk.Label(frame, text=f"Customer ID: {customer_id}", font=("Arial", 16, "normal"), bg="white")
         custname_label.grid(row=0, column=1, sticky="e", padx=10, pady=(7, 0), columnspan=2)
+        frame.custname_label = custname_label
 
         # Status label (non-editable)
         status_label = tk.Label(frame, text=f"Status: {status}", font=("Arial", 14, "italic"), bg="white")
         status_label.grid(row=1, column=2, sticky="e", padx=10, pady=10)
+        frame.status_label = status_label
+        return frame
+
+    def update_order_card(self, frame, order):
+        """Updates an existing card in place with the order's latest data."""
+        frame.order = order
+        frame.custname_label.config(text=f"Customer ID: {order['CustomerID']}")
+        frame.status_label.config(text=f"Status: {order['Status']}")
 
     def on_closing(self):
         self.destroy()
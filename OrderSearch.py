@@ -0,0 +1,141 @@
+import bisect
+import threading
+from FileOps import synchronized
+from OrderStore import get_order_store, ORDERS_FILE
+from OrderContents import decode_contents_or_empty
+
+
+def char_kind(ch):
+    return 'a' if ch.isalpha() else 'd' if ch.isdigit() else 'p'
+
+
+def tokens_of(text):
+    """Splits text into searchable tokens: every word, plus what follows each switch
+    between letters, digits and punctuation inside it, so '181024bob-3' can be
+    found by '181024', 'bob' or '3' as well as by its start."""
+    tokens = set()
+    for word in text.lower().split():
+        tokens.add(word)
+        for i in range(1, len(word)):
+            if char_kind(word[i]) != char_kind(word[i - 1]):
+                tokens.add(word[i:])
+    return tokens
+
+
+def order_tokens(order, contents):
+    tokens = tokens_of(order['OrderID']) | tokens_of(order['CustomerID'])
+    for item in contents:
+        tokens |= tokens_of(str(list(item.keys())[0]))
+    return tokens
+
+
+class OrderSearchIndex:
+    """Inverted index over orders.csv: each token of an OrderID, CustomerID or item
+    name maps to the positions (in the order store) of the orders containing it.
+    Tokens are kept sorted, so every word of a query is matched as a prefix with a
+    binary search. The index is built on first use and afterwards only reads the
+    rows appended since, like ActiveOrders does. It is shared by the Tk thread,
+    background workers and the order service's threads, so sync and search hold
+    self.lock."""
+
+    def __init__(self, path=ORDERS_FILE):
+        self.store = get_order_store(path)
+        self.tokens = []    # sorted distinct tokens
+        self.postings = {}  # token -> {position, ...}
+        self.generation = None
+        self.offset = 0
+        self.lock = threading.RLock()
+
+    @synchronized
+    def sync(self):
+        """Indexes the orders appended since the last call (everything if the file was rewritten)."""
+        self.store.sync()
+        if self.store.generation != self.generation:
+            self.tokens = []
+            self.postings = {}
+            self.generation = self.store.generation
+            self.offset = 0
+        rows, self.offset = self.store.rows_after(self.offset)
+        new_tokens = set()
+        for row in rows:
+            position = self.store.positions.get(row['OrderID'])
+            if position is None:
+                continue
+            for token in order_tokens(row, decode_contents_or_empty(row['Contents'], row['OrderID'])):
+                if token not in self.postings:
+                    self.postings[token] = set()
+                    new_tokens.add(token)
+                self.postings[token].add(position)
+        if new_tokens:
+            if len(new_tokens) > len(self.tokens):
+                self.tokens = sorted(set(self.tokens) | new_tokens)
+            else:
+                for token in new_tokens:
+                    bisect.insort(self.tokens, token)
+
+    def prefix_matches(self, word):
+        """Returns the positions of the orders having a token that starts with word."""
+        found = set()
+        i = bisect.bisect_left(self.tokens, word)
+        while i < len(self.tokens) and self.tokens[i].startswith(word):
+            found |= self.postings[self.tokens[i]]
+            i += 1
+        return found
+
+    @synchronized
+    def search(self, query):
+        """Returns the OrderIDs (oldest first) of the orders matching every word of the
+        query, or None for a blank query, meaning no filtering."""
+        words = query.lower().split()
+        if not words:
+            return None
+        # The store lock keeps its positions from moving between indexing and the lookup
+        with self.store.lock:
+            self.sync()
+            found = None
+            for word in sorted(words, key=len, reverse=True):
+                matches = self.prefix_matches(word)
+                found = matches if found is None else found & matches
+                if not found:
+                    return []
+            ids = self.store.ids
+            return [ids[position] for position in sorted(found) if ids[position] is not None]
+
+
+class DebouncedSearch:
+    """Runs a search once typing pauses for `delay` ms. Each keystroke cancels the
+    pending search, and a search whose query is no longer in the entry is dropped."""
+
+    def __init__(self, widget, variable, callback, delay=250):
+        self.widget = widget
+        self.variable = variable
+        self.callback = callback
+        self.delay = delay
+        self.job = None
+
+    def trigger(self, event=None):
+        self.cancel()
+        self.job = self.widget.after(self.delay, self.run, self.variable.get())
+
+    def cancel(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+    def run(self, query):
+        self.job = None
+        if query == self.variable.get():
+            self.callback()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Returns the search index shared by every window of this process."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = OrderSearchIndex()
+        return _index
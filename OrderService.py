@@ -0,0 +1,422 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+from Storage import Storage, open_local_storage, read_service_address
+from FileWatch import open_change_waiter
+from MenuCatalog import MenuCatalog
+
+# Requests and replies are single lines of JSON:
+#   -> {"id": 7, "op": "read_orders", "args": [["181026bob-1"], true]}
+#   <- {"id": 7, "result": [...]}   or   {"id": 7, "error": ["KeyError", "message"]}
+# After {"op": "subscribe"}, a connection only receives {"event": "orders"} lines,
+# one each time orders are added or change status.
+
+ORDER_WRITE_OPS = {'add_order', 'update_status'}
+READ_OPS = {'load_catalog', 'user_exists', 'order_ids', 'read_orders', 'ids_with_status', 'active_orders', 'search_orders'}
+ERRORS = {'KeyError': KeyError, 'ValueError': ValueError, 'FileNotFoundError': FileNotFoundError}
+LINE_LIMIT = 64 * 1024 * 1024
+
+
+class OrderService:
+    """Local service owning the data, so that kiosks and kitchen screens share one
+    set of file reads and one in-memory copy of the hot state (menu catalog, user
+    index, active orders) instead of each process keeping its own.
+
+    Each request runs on the event loop's thread pool against the backend
+    configured in storage.ini, so a slow disk only holds up that one request."""
+
+    def __init__(self, storage=None):
+        self.storage = storage if storage is not None else open_local_storage()
+        self.users = self.storage.user_store()
+        self.catalog = None
+        self.catalog_version = 0
+        self.active = {}  # statuses -> [active orders, version, newest first, lock]
+        self.lock = threading.Lock()
+        # Versions handed to clients are "<epoch>-<n>": the counters restart with the
+        # service, and a client must not take a new version 1 for the one it cached
+        self.epoch = uuid.uuid4().hex
+        self.subscribers = set()  # StreamWriters of subscribed connections
+
+    # ---- operations -----------------------------------------------------------
+
+    def op_load_catalog(self, known_version=None):
+        catalog = self.storage.load_catalog()
+        with self.lock:
+            if catalog is not self.catalog:
+                self.catalog = catalog
+                self.catalog_version += 1
+            version = self.version(self.catalog_version)
+        if version == known_version:
+            return {'version': version}
+        return {'version': version, 'rows': catalog.rows, 'ids': catalog.ids}
+
+    def op_write_menu(self, rows, ids):
+        self.storage.write_menu([tuple(row) for row in rows], ids)
+
+    def op_user_verify(self, username, password):
+        return self.users.verify(username, password)
+
+    def op_user_exists(self, username):
+        return self.users.exists(username)
+
+    def op_user_add(self, username, password):
+        return self.users.add_user(username, password)
+
+    def op_next_order_number(self, username, today_date):
+        return self.storage.next_order_number(username, today_date)
+
+    def op_add_order(self, order):
+        self.storage.add_order(order)
+
+    def op_order_ids(self):
+        return self.storage.order_ids()
+
+    def op_read_orders(self, order_ids, decode=True):
+        return self.storage.read_orders(order_ids, decode)
+
+    def op_ids_with_status(self, statuses):
+        return self.storage.ids_with_status(*statuses)
+
+    def op_update_status(self, order_id, new_status):
+        self.storage.update_status(order_id, new_status)
+
+    def op_active_orders(self, statuses, known_version=None):
+        """Returns {'version'} if the active orders are unchanged since known_version,
+        else {'version', 'orders'} with the orders newest first."""
+        key = tuple(statuses)
+        with self.lock:
+            entry = self.active.setdefault(key, [None, 0, [], threading.Lock()])
+        # Refreshing reads the disk, so it only holds up requests for the same statuses
+        with entry[3]:
+            if entry[0] is None:
+                entry[0] = self.storage.active_orders(key)
+            if entry[0].refresh() or entry[1] == 0:
+                entry[1] += 1
+                entry[2] = entry[0].newest_first()
+            version = self.version(entry[1])
+            if version == known_version:
+                return {'version': version}
+            return {'version': version, 'orders': entry[2]}
+
+    def op_search_orders(self, query):
+        return self.storage.search_orders(query)
+
+    def version(self, number):
+        return f"{self.epoch}-{number}"
+
+    # ---- serving ----------------------------------------------------------------
+
+    def call(self, request):
+        method = getattr(self, f"op_{request.get('op')}", None)
+        if method is None:
+            raise ValueError(f"Unknown operation {request.get('op')!r}")
+        return method(*request.get('args', []))
+
+    def notify(self):
+        """Pushes an orders event to every subscriber."""
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+            else:
+                writer.write(b'{"event":"orders"}\n')
+
+    def watch(self):
+        """Notifies subscribers of order changes made without going through the
+        service too (e.g. by a terminal that fell back to direct access), using the
+        backend's change watcher."""
+        loop = asyncio.get_running_loop()
+        return self.storage.watch_orders(lambda: loop.call_soon_threadsafe(self.notify))
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    if request.get('op') == 'subscribe':
+                        self.subscribers.add(writer)
+                        continue
+                    result = await loop.run_in_executor(None, self.call, request)
+                    reply = {'id': request.get('id'), 'result': result}
+                    if request.get('op') in ORDER_WRITE_OPS:
+                        self.notify()
+                except Exception as e:
+                    message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+                    reply = {'id': request.get('id'), 'error': [type(e).__name__, message]}
+                writer.write(json.dumps(reply, separators=(',', ':')).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    async def serve(self, host, port):
+        self.storage.start_maintenance()
+        server = await asyncio.start_server(self.handle, host, port, limit=LINE_LIMIT)
+        self.watcher = self.watch()
+        print(f"Order service listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+class ServiceUnavailable(ConnectionError):
+    pass
+
+
+class ServiceStorage(Storage):
+    """Storage that forwards every call to the order service.
+
+    When the service cannot be reached, reads fall back to direct access through
+    the local backend; writes do too when the service was down before the request
+    was sent, but not when a connection broke mid-request (the write may have
+    happened), which raises ConnectionError instead. Reconnecting is tried again
+    after retry_after seconds."""
+
+    name = 'service'
+
+    def __init__(self, address, fallback, timeout=10, retry_after=5):
+        self.address = address
+        self.fallback = fallback
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.sock = None
+        self.file = None
+        self.next_id = 0
+        self.down_until = 0
+        self.catalog = None  # (version, MenuCatalog)
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if time.monotonic() < self.down_until:
+            raise ServiceUnavailable("order service unavailable")
+        try:
+            self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        except OSError:
+            self.down_until = time.monotonic() + self.retry_after
+            raise ServiceUnavailable("order service unavailable")
+        self.file = self.sock.makefile('rb')
+
+    def disconnect(self):
+        for closeable in (self.file, self.sock):
+            try:
+                if closeable is not None:
+                    closeable.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.file = None
+        self.down_until = time.monotonic() + self.retry_after
+
+    def request(self, op, *args):
+        """Sends one request and returns its result, raising the error it reported."""
+        with self.lock:
+            if self.sock is None:
+                self.connect()
+            self.next_id += 1
+            message = json.dumps({'id': self.next_id, 'op': op, 'args': args}, separators=(',', ':')).encode('utf-8') + b'\n'
+            try:
+                self.sock.sendall(message)
+                line = self.file.readline()
+                if not line:
+                    raise ConnectionError("order service closed the connection")
+            except OSError:
+                self.disconnect()
+                raise
+            reply = json.loads(line)
+        if 'error' in reply:
+            name, message = reply['error']
+            raise ERRORS.get(name, RuntimeError)(message)
+        return reply['result']
+
+    def call(self, op, *args, local=None):
+        """request(), falling back to local() if the service cannot be used."""
+        try:
+            return self.request(op, *args)
+        except ServiceUnavailable:
+            return local()
+        except OSError:
+            if op in READ_OPS:
+                return local()
+            raise
+
+    # ---- menu -------------------------------------------------------------------
+
+    def load_catalog(self):
+        known = self.catalog[0] if self.catalog is not None else None
+        try:
+            reply = self.request('load_catalog', known)
+        except OSError:
+            # The menu may change while the service is away; start afresh when it is back
+            self.catalog = None
+            return self.fallback.load_catalog()
+        if 'rows' in reply:
+            self.catalog = (reply['version'], MenuCatalog([tuple(row) for row in reply['rows']], reply['ids']))
+        return self.catalog[1]
+
+    def write_menu(self, rows, ids):
+        self.call('write_menu', [list(row) for row in rows], list(ids), local=lambda: self.fallback.write_menu(rows, ids))
+
+    # ---- users ------------------------------------------------------------------
+
+    def user_store(self):
+        return ServiceUserStore(self)
+
+    # ---- orders -----------------------------------------------------------------
+
+    def next_order_number(self, username, today_date):
+        return self.call('next_order_number', username, today_date, local=lambda: self.fallback.next_order_number(username, today_date))
+
+    def add_order(self, order):
+        self.call('add_order', order, local=lambda: self.fallback.add_order(order))
+
+    def order_ids(self):
+        return self.call('order_ids', local=self.fallback.order_ids)
+
+    def read_orders(self, order_ids, decode=True):
+        return self.call('read_orders', list(order_ids), decode, local=lambda: self.fallback.read_orders(order_ids, decode))
+
+    def ids_with_status(self, *statuses):
+        return self.call('ids_with_status', statuses, local=lambda: self.fallback.ids_with_status(*statuses))
+
+    def update_status(self, order_id, new_status):
+        self.call('update_status', order_id, new_status, local=lambda: self.fallback.update_status(order_id, new_status))
+
+    def active_orders(self, statuses):
+        return ServiceActiveOrders(self, statuses)
+
+    def search_orders(self, query):
+        return self.call('search_orders', query, local=lambda: self.fallback.search_orders(query))
+
+    def orders_token(self):
+        return self.fallback.orders_token()
+
+    def watch_orders(self, callback, interval=0.2):
+        return ServiceWatcher(self, callback, interval)
+
+    def start_maintenance(self):
+        pass  # The service does it
+
+
+class ServiceWatcher:
+    """Subscription to the service's order events, calling callback() for each one
+    on a background thread. While the service is down it watches the local
+    backend instead, trying to subscribe again every retry_after seconds."""
+
+    def __init__(self, storage, callback, interval=0.2):
+        self.storage = storage
+        self.callback = callback
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.sock = None
+        self.last = None  # Local orders token, while the service is down
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.sock = socket.create_connection(self.storage.address, timeout=self.storage.timeout)
+                self.sock.settimeout(None)
+                self.sock.sendall(b'{"op":"subscribe"}\n')
+                self.callback()  # Catch up on anything missed while not subscribed
+                for line in self.sock.makefile('rb'):
+                    if self.stopped.is_set():
+                        return
+                    self.callback()
+            except OSError:
+                pass
+            finally:
+                if self.sock is not None:
+                    self.sock.close()
+                    self.sock = None
+            self.poll_locally(time.monotonic() + self.storage.retry_after)
+
+    def poll_locally(self, until):
+        """Watches the local backend until the given time. The last token is kept
+        between calls, so a change made while trying to resubscribe is not lost."""
+        waiter = open_change_waiter(self.storage.fallback.watched_paths())
+        try:
+            while not self.stopped.is_set() and time.monotonic() < until:
+                try:
+                    token = self.storage.fallback.orders_token()
+                except Exception:
+                    token = self.last
+                if self.last is not None and token != self.last:
+                    self.callback()
+                self.last = token
+                if waiter is not None:
+                    waiter.wait(min(1.0, max(0, until - time.monotonic())))
+                else:
+                    self.stopped.wait(self.interval)
+        finally:
+            if waiter is not None:
+                waiter.close()
+
+    def close(self):
+        self.stopped.set()
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class ServiceUserStore:
+    def __init__(self, storage):
+        self.storage = storage
+        self.local = storage.fallback.user_store
+
+    def verify(self, username, password):
+        return self.storage.call('user_verify', username, password, local=lambda: self.local().verify(username, password))
+
+    def exists(self, username):
+        return self.storage.call('user_exists', username, local=lambda: self.local().exists(username))
+
+    def add_user(self, username, password):
+        return self.storage.call('user_add', username, password, local=lambda: self.local().add_user(username, password))
+
+
+class ServiceActiveOrders:
+    """Active orders kept by the service; refresh() only transfers them when they changed.
+    Falls back to the local backend's own ActiveOrders while the service is down."""
+
+    def __init__(self, storage, statuses):
+        self.storage = storage
+        self.statuses = tuple(statuses)
+        self.version = None
+        self.orders = []
+        self.local = None
+
+    def refresh(self):
+        try:
+            reply = self.storage.request('active_orders', self.statuses, self.version)
+        except OSError:
+            if self.local is None:
+                self.local = self.storage.fallback.active_orders(self.statuses)
+            self.version = None
+            changed = self.local.refresh()
+            self.orders = self.local.newest_first()
+            return changed
+        self.local = None
+        if 'orders' not in reply:
+            return False
+        self.version = reply['version']
+        self.orders = reply['orders']
+        return True
+
+    def newest_first(self):
+        return list(self.orders)
+
+
+if __name__ == "__main__":
+    host, port = read_service_address() or ('127.0.0.1', 8765)
+    asyncio.run(OrderService().serve(host, port))
@@ -0,0 +1,465 @@
+import atexit
+import csv
+import json
+import os
+import threading
+import time
+from FileOps import file_lock, lock_path_for, synchronized
+from StatusLog import get_status_log, read_complete_lines
+from OrderContents import decode_contents_or_empty
+
+ORDERS_FILE = 'orders.csv'
+FIELDNAMES = ['OrderID', 'CustomerID', 'Contents', 'Total', 'Status']
+
+
+def parse_row(line, header):
+    """Parses a single raw CSV line (bytes) into a dictionary keyed by the header."""
+    values = next(csv.reader([line.decode('utf-8', errors='replace')]))
+    return dict(zip(header, values))
+
+
+def format_row(row, header):
+    """Formats a dictionary as a single CSV line (bytes), matching csv.DictWriter output."""
+    buffer = _LineBuffer()
+    csv.DictWriter(buffer, fieldnames=header).writerow(row)
+    return buffer.value.encode('utf-8')
+
+
+class _LineBuffer:
+    """Minimal file-like object that collects what the csv writer produces."""
+    def __init__(self):
+        self.value = ''
+
+    def write(self, text):
+        self.value += text
+
+
+class OrderStore:
+    """Keeps a persistent OrderID -> byte offset index over an orders CSV file,
+    plus secondary indexes on CustomerID and Status, so single orders can be
+    read without scanning the whole file.
+
+    Status changes made since the last compaction live in the status log; every
+    lookup folds them over the Status stored in the file."""
+
+    def __init__(self, path=ORDERS_FILE):
+        self.path = path
+        self.generation = 0    # Bumped whenever rows may have moved, so tailing readers reload
+        self.index_path = path + '.idx'
+        self.header = None
+        self.ids = []          # OrderIDs in file order
+        self.positions = {}    # OrderID -> position in self.ids
+        self.offsets = {}      # OrderID -> byte offset of its row
+        self.customers = {}    # OrderID -> CustomerID
+        self.statuses = {}     # OrderID -> Status
+        self.by_customer = {}  # CustomerID -> [OrderID, ...]
+        self.by_status = {}    # Status -> {OrderID, ...}
+        self.size = 0
+        self.mtime = 0
+        self.inode = None
+        self.tail = ''
+        self.dirty = False
+        self.lock = threading.RLock()  # The compaction thread shares the store with the Tk thread
+        self.status_log = get_status_log()
+        self.load_index()
+        self.sync()
+
+    # ---- index persistence -------------------------------------------------
+
+    def load_index(self):
+        """Loads the saved index if there is one; a bad or missing file just means a rebuild."""
+        try:
+            with open(self.index_path, 'r') as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return
+        self.reset()
+        self.header = saved['header']
+        self.size = saved['size']
+        self.mtime = saved['mtime']
+        self.inode = saved.get('inode')
+        self.tail = saved['tail']
+        for order_id, offset, customer_id, status in saved['rows']:
+            self.add_entry(order_id, offset, customer_id, status)
+        self.dirty = False
+
+    @synchronized
+    def save_index(self):
+        """Writes the index next to the orders file (only when something changed)."""
+        if not self.dirty:
+            return
+        rows = [[order_id, self.offsets[order_id], self.customers[order_id], self.statuses[order_id]]
+                for order_id in self.ids if order_id is not None]
+        saved = {'header': self.header, 'size': self.size, 'mtime': self.mtime, 'inode': self.inode, 'tail': self.tail, 'rows': rows}
+        temp_path = self.index_path + '.tmp'
+        try:
+            with open(temp_path, 'w') as file:
+                json.dump(saved, file)
+            os.replace(temp_path, self.index_path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Error saving {self.index_path}: {e}")
+
+    def reset(self):
+        self.generation += 1
+        self.header = None
+        self.ids = []
+        self.positions = {}
+        self.offsets = {}
+        self.customers = {}
+        self.statuses = {}
+        self.by_customer = {}
+        self.by_status = {}
+        self.size = 0
+        self.mtime = 0
+        self.inode = None
+        self.tail = ''
+        self.dirty = True
+
+    def add_entry(self, order_id, offset, customer_id, status):
+        if order_id in self.positions:
+            # A repeated OrderID: the latest row wins, like the old full scans
+            self.remove_entry(order_id)
+        self.positions[order_id] = len(self.ids)
+        self.ids.append(order_id)
+        self.offsets[order_id] = offset
+        self.customers[order_id] = customer_id
+        self.statuses[order_id] = status
+        self.by_customer.setdefault(customer_id, []).append(order_id)
+        self.by_status.setdefault(status, set()).add(order_id)
+
+    def remove_entry(self, order_id):
+        position = self.positions.pop(order_id)
+        self.ids[position] = None
+        self.by_customer[self.customers.pop(order_id)].remove(order_id)
+        self.by_status[self.statuses.pop(order_id)].discard(order_id)
+        del self.offsets[order_id]
+
+    # ---- keeping the index in step with the file ---------------------------
+
+    @synchronized
+    def sync(self):
+        """Brings the index up to date with the file: nothing to do if it is unchanged,
+        index only the appended rows if it grew, and rebuild if it was rewritten.
+
+        Appends only ever make the file longer. A new inode (compaction renames a
+        rewritten copy into place) or a change that kept or shrank the size - such
+        as another process switching Preparing to Delivered - means rows may have
+        changed anywhere, so the index is rebuilt."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self.ids or self.size:
+                self.reset()
+            return
+        if stat.st_size == self.size and stat.st_mtime_ns == self.mtime and stat.st_ino == self.inode:
+            return
+        with open(self.path, 'rb') as file:
+            stat = os.fstat(file.fileno())  # The file that is actually read, if it was just replaced
+            if stat.st_ino != self.inode or stat.st_size <= self.size or not self.tail_matches(file):
+                self.reset()
+            self.index_from(file, self.size)
+        self.mtime = stat.st_mtime_ns
+        self.inode = stat.st_ino
+        self.dirty = True
+
+    def tail_matches(self, file):
+        """Checks that the last indexed row is still where the index says it is."""
+        if not self.ids:
+            return self.size == 0
+        last_id = self.last_id()
+        offset = self.offsets[last_id]
+        file.seek(offset)
+        line = file.read(self.size - offset).decode('utf-8', errors='replace')
+        return line == self.tail
+
+    def index_from(self, file, offset):
+        """Indexes every complete row starting at the given byte offset."""
+        file.seek(offset)
+        if offset == 0:
+            first = file.readline()
+            if not first.endswith(b'\n'):
+                return
+            self.header = next(csv.reader([first.decode('utf-8', errors='replace')]))
+            offset = file.tell()
+        while True:
+            line = file.readline()
+            if not line.endswith(b'\n'):
+                # Stop before a partially written row; it is picked up on the next sync
+                break
+            if line.strip():
+                row = parse_row(line, self.header)
+                self.add_entry(row['OrderID'], offset, row['CustomerID'], row['Status'])
+                self.tail = line.decode('utf-8', errors='replace')
+            offset = file.tell()
+        self.size = offset
+
+    def last_id(self):
+        for order_id in reversed(self.ids):
+            if order_id is not None:
+                return order_id
+        return None
+
+    # ---- lookups ------------------------------------------------------------
+
+    def read_row(self, file, order_id):
+        file.seek(self.offsets[order_id])
+        return parse_row(file.readline(), self.header)
+
+    @synchronized
+    def __contains__(self, order_id):
+        self.sync()
+        return order_id in self.offsets
+
+    @synchronized
+    def get(self, order_id, decode=True):
+        """Returns the order with the given OrderID, or None if there is no such order."""
+        self.sync()
+        if order_id not in self.offsets:
+            return None
+        return self.read_orders([order_id], decode)[0]
+
+    @synchronized
+    def read_orders(self, order_ids, decode=True):
+        """Reads the given orders (in the given order) by seeking straight to their rows."""
+        orders = []
+        if not order_ids:
+            return orders
+        self.status_log.sync()
+        with open(self.path, 'rb') as file:
+            for order_id in order_ids:
+                row = self.read_row(file, order_id)
+                row['Status'] = self.status_log.status_of(order_id, row['Status'])
+                if decode:
+                    row['Contents'] = decode_contents_or_empty(row['Contents'], row['OrderID'])
+                orders.append(row)
+        return orders
+
+    @synchronized
+    def rows_after(self, offset):
+        """Returns (rows, end offset) for the indexed rows at or after the given byte
+        offset, undecoded, so a reader can pick up only what was appended."""
+        self.sync()
+        rows = []
+        if offset >= self.size:
+            return rows, self.size
+        with open(self.path, 'rb') as file:
+            file.seek(offset)
+            if offset == 0:
+                file.readline()  # Skip the header
+            for line, _ in read_complete_lines(file):
+                if file.tell() > self.size:
+                    break
+                rows.append(parse_row(line, self.header))
+        return rows, self.size
+
+    @synchronized
+    def order_ids(self):
+        """Returns every OrderID in file order."""
+        self.sync()
+        return [order_id for order_id in self.ids if order_id is not None]
+
+    @synchronized
+    def ids_for_customer(self, customer_id):
+        self.sync()
+        return list(self.by_customer.get(customer_id, []))
+
+    @synchronized
+    def status_of(self, order_id):
+        self.sync()
+        self.status_log.sync()
+        return self.status_log.status_of(order_id, self.statuses[order_id])
+
+    @synchronized
+    def ids_with_status(self, *statuses):
+        """Returns the OrderIDs having any of the given statuses, in file order."""
+        self.sync()
+        self.status_log.sync()
+        found = set()
+        with self.status_log.lock:
+            logged = self.status_log.latest
+            for status in statuses:
+                found.update(order_id for order_id in self.by_status.get(status, ()) if order_id not in logged)
+                found.update(order_id for order_id in self.status_log.by_status.get(status, ()) if order_id in self.offsets)
+        return sorted(found, key=self.positions.__getitem__)
+
+    def orders_with_status(self, *statuses, decode=True):
+        return self.read_orders(self.ids_with_status(*statuses), decode)
+
+    # ---- updates ------------------------------------------------------------
+
+    @synchronized
+    def rewrite_statuses(self, changes):
+        """Writes the given {OrderID: Status} changes into the file in one streaming pass."""
+        def apply(row):
+            if row['OrderID'] in changes and changes[row['OrderID']] != row['Status']:
+                row['Status'] = changes[row['OrderID']]
+                return True
+            return False
+        self.rewrite_rows(apply)
+
+    @synchronized
+    def rewrite_rows(self, transform):
+        """Rewrites the file in one streaming pass (temporary file plus rename), letting
+        transform(row) change each row in place and return True if it did, and
+        re-indexes the rows as they are written. The caller holds the file's lock so
+        no row is appended meanwhile."""
+        if not os.path.isfile(self.path):
+            return
+        temp_path = self.path + '.tmp'
+        with open(self.path, 'rb') as source, open(temp_path, 'wb') as target:
+            first = source.readline()
+            if not first.endswith(b'\n'):
+                return
+            self.reset()
+            self.header = next(csv.reader([first.decode('utf-8', errors='replace')]))
+            target.write(first)
+            for line, _ in read_complete_lines(source):
+                row = parse_row(line, self.header)
+                if transform(row):
+                    line = format_row(row, self.header)
+                offset = target.tell()
+                target.write(line)
+                self.add_entry(row['OrderID'], offset, row['CustomerID'], row['Status'])
+                self.tail = line.decode('utf-8', errors='replace')
+            self.size = target.tell()
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(temp_path, self.path)
+        stat = os.stat(self.path)
+        self.mtime = stat.st_mtime_ns
+        self.inode = stat.st_ino
+        self.dirty = True
+
+
+class ActiveOrders:
+    """Keeps the orders with the given statuses (Pending/Preparing for the kitchen) in memory.
+
+    refresh() parses only the rows appended to the orders file and the status changes
+    logged since the last call, does nothing when neither changed, and reloads
+    the active orders from the index only when the file or log was rewritten."""
+    def __init__(self, statuses=('Pending', 'Preparing'), path=ORDERS_FILE):
+        self.statuses = statuses
+        self.store = get_order_store(path)
+        self.status_log = get_status_log()
+        self.orders = {}  # OrderID -> order
+        self.store_generation = None
+        self.offset = 0
+        self.log_generation = None
+        self.log_position = 0
+
+    def refresh(self):
+        """Brings the active orders up to date; returns True if any of them changed."""
+        self.store.sync()
+        self.status_log.sync()
+        if self.store.generation != self.store_generation or self.status_log.generation != self.log_generation:
+            self.reload()
+            return True
+
+        changed = False
+        if self.store.size != self.offset:
+            rows, self.offset = self.store.rows_after(self.offset)
+            for row in rows:
+                row['Status'] = self.status_log.status_of(row['OrderID'], row['Status'])
+                if row['Status'] in self.statuses:
+                    row['Contents'] = decode_contents_or_empty(row['Contents'], row['OrderID'])
+                    self.orders[row['OrderID']] = row
+                    changed = True
+
+        changes, self.log_position = self.status_log.changes_since(self.log_position)
+        for order_id, status in changes:
+            if status not in self.statuses:
+                changed |= self.orders.pop(order_id, None) is not None
+            elif order_id in self.orders:
+                self.orders[order_id]['Status'] = status
+                changed = True
+            elif order_id in self.store:
+                order = self.store.get(order_id)
+                # The status read back wins over the logged one, should they disagree
+                if order['Status'] in self.statuses:
+                    self.orders[order_id] = order
+                    changed = True
+        return changed
+
+    def reload(self):
+        with self.store.lock, self.status_log.lock:
+            # Rows are checked again after reading, so an index that lags behind the
+            # file can never show a delivered order as active
+            self.orders = {order['OrderID']: order for order in self.store.orders_with_status(*self.statuses)
+                           if order['Status'] in self.statuses}
+            self.store_generation = self.store.generation
+            self.offset = self.store.size
+            self.log_generation = self.status_log.generation
+            self.log_position = len(self.status_log.sequence)
+
+    def newest_first(self):
+        """Returns the active orders, most recently placed first."""
+        positions = self.store.positions
+        return sorted(self.orders.values(), key=lambda order: positions.get(order['OrderID'], -1), reverse=True)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_order_store(path=ORDERS_FILE):
+    """Returns the shared OrderStore for the given file, creating it on first use."""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = OrderStore(path)
+        return store
+
+
+def compact_status_log(min_events=1):
+    """Folds the logged status changes into orders.csv and the customers' order files,
+    then drops them from the log. Events logged while this runs are kept."""
+    status_log = get_status_log()
+    changes, generation, end = status_log.read_events()
+    if len(changes) < min_events:
+        return
+    main_store = get_order_store(ORDERS_FILE)
+    changes_by_file = {ORDERS_FILE: changes}
+    with main_store.lock:
+        # Orders appended since the last lookup must be indexed, or their changes would
+        # be dropped from the log without reaching their customer's file
+        main_store.sync()
+        for order_id, status in changes.items():
+            if order_id in main_store.customers:
+                user_file = f"{main_store.customers[order_id]}_orders.csv"
+                changes_by_file.setdefault(user_file, {})[order_id] = status
+    for path, file_changes in changes_by_file.items():
+        with file_lock(lock_path_for(path)):
+            store = get_order_store(path)
+            store.sync()
+            store.rewrite_statuses(file_changes)
+    status_log.drop_through(generation, end)
+
+
+_compactor = None
+
+
+def start_compaction(interval=60, min_events=200):
+    """Runs compact_status_log in a background thread every `interval` seconds,
+    once at least `min_events` orders have logged changes."""
+    global _compactor
+    if _compactor is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                compact_status_log(min_events)
+            except Exception as e:
+                print(f"Error compacting {get_status_log().path}: {e}")
+    _compactor = threading.Thread(target=run, daemon=True)
+    _compactor.start()
+
+
+@atexit.register
+def save_all_indexes():
+    """Indexes are saved once on exit instead of after every change; a stale index
+    is detected and brought up to date on the next start."""
+    for store in _stores.values():
+        store.save_index()
@@ -0,0 +1,82 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from FileOps import file_lock, lock_path_for
+from OrderStore import format_row, FIELDNAMES, ORDERS_FILE
+
+
+class OrderWriter:
+    """Single writer thread for new order rows.
+
+    Checkouts queue their rows and wait on a Future. The writer takes whatever
+    has queued up (up to max_batch rows, waiting at most linger seconds for a
+    burst to fill in) and commits the group with one locked write and one fsync
+    per file: orders.csv gets every row, each {customer}_orders.csv its own.
+    During a rush the cost per order falls as the batches grow, instead of every
+    checkout paying for its own fsync. The advisory file locks keep other
+    processes' writers and the status log compaction out while a batch is written."""
+
+    def __init__(self, max_batch=256, linger=0.002):
+        self.max_batch = max_batch
+        self.linger = linger
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, order):
+        """Queues an order row; the Future resolves once it is on disk."""
+        future = Future()
+        self.queue.put((order, future))
+        return future
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self.queue.get(timeout=self.linger))
+            except queue.Empty:
+                pass
+            try:
+                self.write_batch([order for order, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for _, future in batch:
+                    future.set_result(None)
+
+    def write_batch(self, orders):
+        rows_by_file = {}
+        for order in orders:
+            rows_by_file.setdefault(f"{order['CustomerID']}_orders.csv", []).append(order)
+        rows_by_file[ORDERS_FILE] = orders
+        for file_name, rows in rows_by_file.items():
+            append_rows(file_name, rows)
+
+
+def append_rows(file_name, rows):
+    """Appends the rows to an orders CSV file (with a header if it is new) in one
+    write and one fsync, under the file's advisory lock."""
+    data = b''.join(format_row(row, FIELDNAMES) for row in rows)
+    with file_lock(lock_path_for(file_name)):
+        with open(file_name, 'ab') as file:
+            if file.tell() == 0:
+                data = format_row(dict(zip(FIELDNAMES, FIELDNAMES)), FIELDNAMES) + data
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_order_writer():
+    """Returns the process-wide OrderWriter, starting its thread on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = OrderWriter()
+        return _writer
@@ -0,0 +1,91 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from Analytics import load_analytics
+from TkExecutor import BusyState, run_in_background
+
+class ReportsApp(tk.Toplevel):
+    def __init__(self, root):
+        super().__init__(root)
+        self.root = root
+        self.title("Sales Reports")
+        self.geometry("700x500")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+        root.withdraw()
+
+        # Summary and buttons
+        self.summary_label = tk.Label(self, font=("Arial", 12, "bold"))
+        self.summary_label.grid(row=0, column=0, sticky='w', padx=10, pady=10)
+
+        self.refresh_btn = tk.Button(self, text="Refresh", command=self.load_reports, padx=10, pady=5, bg="lightblue", font=("Arial", 10, "bold"))
+        self.refresh_btn.grid(row=0, column=1, sticky='e', padx=5)
+
+        self.done_btn = tk.Button(self, text="Done", command=self.on_closing, padx=10, pady=5, bg='#4CAF50', font=("Arial", 10, "bold"))
+        self.done_btn.grid(row=0, column=2, sticky='e', padx=10)
+
+        # One tab per report
+        self.notebook = ttk.Notebook(self)
+        self.notebook.grid(row=1, column=0, columnspan=3, padx=10, pady=10, sticky='nsew')
+        self.tables = {
+            'item': self.create_table("By Item", ("Item", "Quantity", "Revenue")),
+            'category': self.create_table("By Category", ("Category", "Quantity", "Revenue")),
+            'type': self.create_table("Veg / Non-Veg", ("Type", "Quantity", "Revenue")),
+            'day': self.create_table("By Day", ("Day", "Orders", "Revenue")),
+            'hour': self.create_table("Peak Hours", ("Hour", "Orders", "Revenue")),
+        }
+
+        self.busy_label = tk.Label(self, fg="gray")
+        self.busy_label.grid(row=2, column=0, columnspan=3, sticky='w', padx=10)
+        self.busy = BusyState(self.busy_label, "Loading reports...", (self.refresh_btn,))
+
+        self.load_reports()
+
+    def create_table(self, title, columns):
+        """Adds a tab holding a Treeview with the given columns and returns the Treeview."""
+        frame = ttk.Frame(self.notebook)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(0, weight=1)
+        self.notebook.add(frame, text=title)
+
+        tree = ttk.Treeview(frame, columns=columns, show="headings")
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=150, anchor="w" if column == columns[0] else "center")
+        tree.grid(row=0, column=0, sticky='nsew')
+
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        scrollbar.grid(row=0, column=1, sticky='ns')
+        tree.configure(yscrollcommand=scrollbar.set)
+        return tree
+
+    def fill_table(self, key, rows):
+        tree = self.tables[key]
+        tree.delete(*tree.get_children())
+        for name, count, revenue in rows:
+            tree.insert("", "end", values=(name, count, f"₹{revenue:.2f}"))
+
+    def load_reports(self):
+        """Archives newly delivered orders and recomputes every report in the background."""
+        run_in_background(self, load_analytics, on_done=self.show_reports, on_error=self.on_load_error, busy=self.busy)
+
+    def on_load_error(self, e):
+        messagebox.showerror("Error", f"Failed to load reports: {str(e)}")
+
+    def show_reports(self, analytics):
+        orders, revenue = analytics.totals()
+        peak = ", ".join(f"{hour:02d}:00" for hour, count, _ in analytics.peak_hours() if count > 0)
+        self.summary_label.config(text=f"Delivered orders: {orders}   Revenue: ₹{revenue:.2f}   Peak hours: {peak or '-'}")
+
+        self.fill_table('item', analytics.by_item())
+        self.fill_table('category', analytics.by_category())
+        self.fill_table('type', analytics.by_type())
+        self.fill_table('day', analytics.by_day())
+        self.fill_table('hour', [(f"{hour:02d}:00 - {hour:02d}:59", count, revenue) for hour, count, revenue in analytics.by_hour()])
+
+    def on_closing(self):
+        self.destroy()
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = ReportsApp(root)
+    root.mainloop()
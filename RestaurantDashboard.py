@@ -1,9 +1,14 @@
+import os
 import tkinter as tk
 from tkinter import filedialog
 from PIL import Image, ImageTk
+from ImageCache import get_photo
+from Thumbnails import load_thumbnail
+from TkExecutor import run_in_background
 from EditMenu import AdminMenuApp
 from CurrentOrders import OrderManagementApp
 from OrderRecords import OrderHistoryApp
+from Reports import ReportsApp
 
 class AdminDashboard(tk.Toplevel):
     def __init__(self, master):
@@ -13,32 +18,27 @@ class AdminDashboard(tk.Toplevel):
         self.master.withdraw()
         self.protocol("WM_DELETE_WINDOW", lambda : self.master.destroy())
 
-        # Load and display restaurant photo
-        try:
-            self.img = Image.open('rest_pic.png')
-            self.w,self.h = self.img.size
-            self.img = self.img.resize((int(200*self.w/self.h), 200))  # Correctly load saved image
-        except FileNotFoundError:
-            self.img = Image.new('RGB', (200, 200), color='grey')  # Placeholder if no image found
+        # Display a placeholder; the restaurant photo is decoded (or read from the
+        # thumbnail cache) in the background and swapped in when ready
+        self.w, self.h = 200, 200
+        self.img = Image.new('RGB', (200, 200), color='grey')  # Placeholder if no image found
         self.img_tk = ImageTk.PhotoImage(self.img)
 
         # Display the photo in a label
         self.photo_label = tk.Label(self, image=self.img_tk, cursor="hand2")
         self.photo_label.pack(pady=10)
         self.photo_label.bind("<Button-1>", self.open_image)  # Click to change image
+        if os.path.isfile('rest_pic.png'):
+            run_in_background(self, load_thumbnail, 'rest_pic.png', 200, on_done=self.show_photo)
 
         # Frame for buttons
         button_frame = tk.Frame(self, pady=10)
         button_frame.pack()
 
-        # Load the PNGs for buttons
-        edit_menu_img = Image.open("icon_edit.png").resize((100, 100), Image.LANCZOS)  # Resized smaller
-        manage_orders_img = Image.open("icon_orders.png").resize((100, 100), Image.LANCZOS)  # Resized smaller
-        billing_history_img = Image.open("icon_hist.png").resize((100, 100), Image.LANCZOS)  # Resized smaller
-
-        self.edit_menu_tk = ImageTk.PhotoImage(edit_menu_img)
-        self.manage_orders_tk = ImageTk.PhotoImage(manage_orders_img)
-        self.billing_history_tk = ImageTk.PhotoImage(billing_history_img)
+        # Load the PNGs for buttons (resized smaller, from the shared image cache)
+        self.edit_menu_tk = get_photo("icon_edit.png", (100, 100))
+        self.manage_orders_tk = get_photo("icon_orders.png", (100, 100))
+        self.billing_history_tk = get_photo("icon_hist.png", (100, 100))
 
         # Create buttons using the provided PNGs as the entire button
         edit_menu_btn = tk.Button(button_frame, image=self.edit_menu_tk, command=self.open_admin_menu_app, bd=0)
@@ -50,21 +50,30 @@ class AdminDashboard(tk.Toplevel):
         billing_history_btn = tk.Button(button_frame, image=self.billing_history_tk, command=self.billing_history, bd=0)
         billing_history_btn.grid(row=1, column=0, columnspan=2, padx=10, pady=10)  # Span across both columns
 
+        reports_btn = tk.Button(button_frame, text="Sales Reports", command=self.sales_reports, padx=10, pady=5, bg='#4CAF50', font=("Arial", 10, "bold"))
+        reports_btn.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 10))
+
         # Fixed window size and non-resizable
-        self.geometry("400x500")  # Set fixed geometry
+        self.geometry("400x550")  # Set fixed geometry
         self.resizable(False, False)  # Non-resizable
 
+    def show_photo(self, img):
+        """Shows a decoded restaurant photo (called on the Tk thread)."""
+        self.img = img
+        self.w, self.h = img.size
+        self.img_tk = ImageTk.PhotoImage(img)
+        self.photo_label.config(image=self.img_tk)
+
     def open_image(self, event=None):
-        try:
-            file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.png;*.jpg")])
-            if file_path:
-                img = Image.open(file_path).resize((int(200*self.w/self.h), 200), Image.LANCZOS)
-                img.save('rest_pic.png')  # Save as rest_pic.png
-                img_tk = ImageTk.PhotoImage(img)
-                self.photo_label.config(image=img_tk)
-                self.photo_label.image = img_tk
-        except Exception:
-            pass
+        file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.png;*.jpg")])
+        if file_path:
+            # Decode and resize off the Tk thread, then save it as rest_pic.png
+            def load_and_save(path, size):
+                img = load_thumbnail(path, size[1], size[0])
+                img.save('rest_pic.png')
+                return img
+            run_in_background(self, load_and_save, file_path, (int(200*self.w/self.h), 200),
+                              on_done=self.show_photo, on_error=lambda e: None)
 
     def open_admin_menu_app(self):
         # Open AdminMenuApp using the original root passed from login.py
@@ -84,6 +93,10 @@ class AdminDashboard(tk.Toplevel):
         # self.master.deiconify()
         self.master.withdraw()
 
+    def sales_reports(self):
+        ReportsApp(self.master)
+        self.master.withdraw()
+
 # Example of running AdminDashboard directly from RestLogin.py (for testing)
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,332 @@
+import glob
+import os
+import sqlite3
+import threading
+from Storage import Storage
+from MenuCatalog import MenuCatalog, load_catalog, MENU_FILE
+from OrderStore import get_order_store, ORDERS_FILE
+from OrderContents import decode_contents_or_empty
+from OrderNumbers import OrderSequence, order_number_of
+from OrderSearch import order_tokens
+from UserStore import hash_password, check_password, is_hashed, USERS_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    customer_id TEXT NOT NULL,
+    contents TEXT NOT NULL,
+    total TEXT NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (status, seq);
+CREATE INDEX IF NOT EXISTS orders_customer ON orders (customer_id, seq);
+CREATE INDEX IF NOT EXISTS orders_version ON orders (version);
+CREATE TABLE IF NOT EXISTS order_tokens (
+    token TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (token, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS menu (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price TEXT NOT NULL,
+    description TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_numbers (
+    username TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('orders_version', 0), ('menu_version', 0);
+"""
+
+ORDER_COLUMNS = "order_id, customer_id, contents, total, status"
+
+
+def order_from_row(row, decode=True):
+    order_id, customer_id, contents, total, status = row[:5]
+    return {'OrderID': order_id, 'CustomerID': customer_id,
+            'Contents': decode_contents_or_empty(contents, order_id) if decode else contents,
+            'Total': total, 'Status': status}
+
+
+class SqliteStorage(Storage):
+    """Everything in one SQLite database in WAL mode, so any number of terminals
+    can read while one writes, every change is a transaction, and lookups by
+    OrderID, status, customer or search token go through an index.
+
+    Each thread gets its own connection. Every order insert and status change
+    takes the next value of the orders_version counter, so readers can fetch just
+    the orders that changed since they last looked."""
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.catalog = None  # (menu_version, MenuCatalog)
+        self.lock = threading.Lock()
+        self.database().executescript(SCHEMA)
+
+    def database(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            # Autocommit mode; transactions are begun explicitly by Transaction
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def connection(self):
+        """A write transaction: `with storage.connection() as db:`."""
+        return Transaction(self.database(), "BEGIN IMMEDIATE")
+
+    def reader(self):
+        """A read transaction, which in WAL mode never waits for writers."""
+        return Transaction(self.database(), "BEGIN")
+
+    def bump(self, db, key):
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = ?", (key,))
+        return db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    # ---- menu ---------------------------------------------------------------
+
+    def load_catalog(self):
+        with self.reader() as db:
+            version = db.execute("SELECT value FROM meta WHERE key = 'menu_version'").fetchone()[0]
+            with self.lock:
+                if self.catalog is not None and self.catalog[0] == version:
+                    return self.catalog[1]
+            rows = db.execute("SELECT category, name, price, description, type, id FROM menu ORDER BY position").fetchall()
+        catalog = MenuCatalog([row[:5] for row in rows], [row[5] for row in rows])
+        with self.lock:
+            self.catalog = (version, catalog)
+        return catalog
+
+    def write_menu(self, rows, ids):
+        with self.connection() as db:
+            db.execute("DELETE FROM menu")
+            db.executemany("INSERT INTO menu VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           ((position, item_id, *map(str, row)) for position, (row, item_id) in enumerate(zip(rows, ids))))
+            self.bump(db, 'menu_version')
+
+    # ---- users --------------------------------------------------------------
+
+    def user_store(self):
+        return SqliteUserStore(self)
+
+    # ---- orders -------------------------------------------------------------
+
+    def next_order_number(self, username, today_date):
+        with self.connection() as db:
+            row = db.execute("SELECT date, number FROM order_numbers WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                # First order through the database: carry on from today's orders already in it
+                number = 0
+                for (order_id,) in db.execute("SELECT order_id FROM orders WHERE customer_id = ?", (username,)):
+                    number = max(number, order_number_of(order_id, today_date, username))
+            else:
+                number = row[1] if row[0] == today_date else 0
+            number += 1
+            db.execute("INSERT OR REPLACE INTO order_numbers VALUES (?, ?, ?)", (username, today_date, number))
+        return number
+
+    def add_order(self, order):
+        with self.connection() as db:
+            self.insert_orders(db, [order])
+
+    def insert_orders(self, db, orders):
+        for order in orders:
+            version = self.bump(db, 'orders_version')
+            seq = db.execute(f"INSERT INTO orders ({ORDER_COLUMNS}, version) VALUES (?, ?, ?, ?, ?, ?)",
+                             (order['OrderID'], order['CustomerID'], order['Contents'], str(order['Total']), order['Status'], version)).lastrowid
+            tokens = order_tokens(order, decode_contents_or_empty(order['Contents'], order['OrderID']))
+            db.executemany("INSERT OR IGNORE INTO order_tokens VALUES (?, ?)", ((token, seq) for token in tokens))
+
+    def order_ids(self):
+        with self.reader() as db:
+            return [order_id for (order_id,) in db.execute("SELECT order_id FROM orders ORDER BY seq")]
+
+    def read_orders(self, order_ids, decode=True):
+        found = {}
+        with self.reader() as db:
+            for start in range(0, len(order_ids), 500):
+                chunk = order_ids[start:start + 500]
+                query = f"SELECT {ORDER_COLUMNS} FROM orders WHERE order_id IN ({','.join('?' * len(chunk))})"
+                for row in db.execute(query, chunk):
+                    found[row[0]] = row
+        return [order_from_row(found[order_id], decode) for order_id in order_ids if order_id in found]
+
+    def ids_with_status(self, *statuses):
+        with self.reader() as db:
+            query = f"SELECT order_id FROM orders WHERE status IN ({','.join('?' * len(statuses))}) ORDER BY seq"
+            return [order_id for (order_id,) in db.execute(query, statuses)]
+
+    def update_status(self, order_id, new_status):
+        with self.connection() as db:
+            version = self.bump(db, 'orders_version')
+            if db.execute("UPDATE orders SET status = ?, version = ? WHERE order_id = ?", (new_status, version, order_id)).rowcount == 0:
+                raise KeyError(f"Order {order_id} does not exist!")
+
+    def active_orders(self, statuses):
+        return SqliteActiveOrders(self, statuses)
+
+    def search_orders(self, query):
+        words = query.lower().split()
+        if not words:
+            return None
+        found = None
+        with self.reader() as db:
+            for word in sorted(words, key=len, reverse=True):
+                # Prefix match on the token index: word <= token < word + U+10FFFF
+                matches = {seq for (seq,) in db.execute("SELECT seq FROM order_tokens WHERE token >= ? AND token < ?", (word, word + '\U0010ffff'))}
+                found = matches if found is None else found & matches
+                if not found:
+                    return []
+            return [order_id for (order_id,) in db.execute(f"SELECT order_id FROM orders WHERE seq IN ({','.join(map(str, found))}) ORDER BY seq")]
+
+    def orders_token(self):
+        with self.reader() as db:
+            return db.execute("SELECT value FROM meta WHERE key = 'orders_version'").fetchone()[0]
+
+    def watched_paths(self):
+        # In WAL mode every commit writes the -wal file; checkpoints write the database
+        return [self.path, self.path + '-wal']
+
+
+class Transaction:
+    """Runs a block as one transaction, committed unless it raises. Writers begin
+    IMMEDIATE, taking the write lock up front, so two of them queue instead of
+    failing to upgrade a read lock."""
+
+    def __init__(self, db, begin):
+        self.db = db
+        self.begin = begin
+
+    def __enter__(self):
+        self.db.execute(self.begin)
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        return False
+
+
+class SqliteUserStore:
+    """UserStore over the users table: each lookup is a primary key query."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def stored_password(self, username):
+        with self.storage.reader() as db:
+            row = db.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        return None if row is None else row[0]
+
+    def exists(self, username):
+        return self.stored_password(username) is not None
+
+    def verify(self, username, password):
+        stored = self.stored_password(username)
+        if stored is None or not check_password(stored, password):
+            return False
+        if not is_hashed(stored):
+            with self.storage.connection() as db:
+                db.execute("UPDATE users SET password = ? WHERE username = ? AND password = ?", (hash_password(password), username, stored))
+        return True
+
+    def add_user(self, username, password):
+        with self.storage.connection() as db:
+            return db.execute("INSERT OR IGNORE INTO users VALUES (?, ?)", (username, hash_password(password))).rowcount == 1
+
+
+class SqliteActiveOrders:
+    """ActiveOrders over the database: refresh() fetches only the orders whose
+    version is newer than the last one seen, through the version index."""
+
+    def __init__(self, storage, statuses=('Pending', 'Preparing')):
+        self.storage = storage
+        self.statuses = statuses
+        self.orders = {}  # OrderID -> order
+        self.seqs = {}    # OrderID -> insertion sequence, for sorting
+        self.version = None
+
+    def refresh(self):
+        """Brings the active orders up to date; returns True if any of them changed."""
+        with self.storage.reader() as db:
+            if self.version is None:
+                self.version = db.execute("SELECT value FROM meta WHERE key = 'orders_version'").fetchone()[0]
+                query = f"SELECT {ORDER_COLUMNS}, seq FROM orders WHERE status IN ({','.join('?' * len(self.statuses))})"
+                for row in db.execute(query, self.statuses):
+                    self.orders[row[0]] = order_from_row(row)
+                    self.seqs[row[0]] = row[5]
+                return True
+            rows = db.execute(f"SELECT {ORDER_COLUMNS}, seq, version FROM orders WHERE version > ? ORDER BY version", (self.version,)).fetchall()
+        changed = False
+        for row in rows:
+            order_id, status = row[0], row[4]
+            self.version = max(self.version, row[6])
+            if status in self.statuses:
+                self.orders[order_id] = order_from_row(row)
+                self.seqs[order_id] = row[5]
+                changed = True
+            elif self.orders.pop(order_id, None) is not None:
+                del self.seqs[order_id]
+                changed = True
+        return changed
+
+    def newest_first(self):
+        """Returns the active orders, most recently placed first."""
+        return sorted(self.orders.values(), key=lambda order: self.seqs[order['OrderID']], reverse=True)
+
+
+def migrate_from_csv(path):
+    """Copies the menu, users, orders (with their latest status) and order counters
+    from the CSV files into the database at path, in one transaction. Only done
+    once: a database that already holds orders or users is left alone."""
+    storage = SqliteStorage(path)
+    with storage.connection() as db:
+        if db.execute("SELECT EXISTS (SELECT 1 FROM orders) OR EXISTS (SELECT 1 FROM users)").fetchone()[0]:
+            print(f"{path} already holds data; nothing migrated")
+            return
+
+        if os.path.isfile(MENU_FILE):
+            catalog = load_catalog(MENU_FILE)
+            db.executemany("INSERT INTO menu VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           ((position, item_id, *row) for position, (row, item_id) in enumerate(zip(catalog.rows, catalog.ids))))
+            storage.bump(db, 'menu_version')
+            print(f"Migrated {len(catalog.rows)} menu items")
+
+        if os.path.isfile(USERS_FILE):
+            from UserStore import UserStore
+            users = UserStore(USERS_FILE)
+            users.sync()
+            db.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)", users.users.items())
+            print(f"Migrated {len(users.users)} users")
+
+        if os.path.isfile(ORDERS_FILE):
+            store = get_order_store(ORDERS_FILE)
+            orders = store.read_orders(store.order_ids(), decode=False)
+            storage.insert_orders(db, orders)
+            print(f"Migrated {len(orders)} orders")
+
+        for seq_path in glob.glob('*_orders.seq'):
+            username = seq_path[:-len('_orders.seq')]
+            date, number = OrderSequence(username).read()
+            if date is not None:
+                db.execute("INSERT OR REPLACE INTO order_numbers VALUES (?, ?, ?)", (username, date, number))
+    print(f"Set 'backend = sqlite' and 'database = {path}' under [storage] in storage.ini to use it")
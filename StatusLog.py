@@ -0,0 +1,131 @@
+import csv
+import os
+import threading
+import time
+from datetime import datetime
+from FileOps import file_lock, atomic_write_text, synchronized
+
+STATUS_LOG_FILE = 'order_status.log'
+
+
+class StatusLog:
+    """Append-only log of order status changes, one 'OrderID,Status,Timestamp' line each.
+
+    The latest event for an order overrides the Status stored in the orders files.
+    The first line holds a generation stamp that changes whenever the log is
+    compacted, so every reader can tell a rewritten log from a grown one."""
+
+    def __init__(self, path=STATUS_LOG_FILE):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.generation = None
+        self.offset = 0
+        self.latest = {}     # OrderID -> latest Status
+        self.by_status = {}  # Status -> {OrderID, ...}
+        self.sequence = []   # (OrderID, Status) in log order, for readers that tail the log
+        self.lock = threading.RLock()
+
+    def reset(self):
+        self.generation = None
+        self.offset = 0
+        self.latest = {}
+        self.by_status = {}
+        self.sequence = []
+
+    def apply(self, order_id, status):
+        old_status = self.latest.get(order_id)
+        if old_status is not None:
+            self.by_status[old_status].discard(order_id)
+        self.latest[order_id] = status
+        self.by_status.setdefault(status, set()).add(order_id)
+        self.sequence.append((order_id, status))
+
+    @synchronized
+    def sync(self):
+        """Folds any newly appended events into the in-memory state."""
+        try:
+            file = open(self.path, 'rb')
+        except FileNotFoundError:
+            self.reset()
+            return
+        with file:
+            first = file.readline()
+            if not first.endswith(b'\n'):
+                return
+            generation = first.decode().split()[-1]
+            if generation != self.generation:
+                self.reset()
+                self.generation = generation
+                self.offset = len(first)
+            if os.fstat(file.fileno()).st_size == self.offset:
+                return
+            file.seek(self.offset)
+            for line, end in read_complete_lines(file):
+                order_id, status, timestamp = next(csv.reader([line.decode()]))
+                self.apply(order_id, status)
+                self.offset = end
+
+    def append(self, order_id, status):
+        """Records a status change as a single small append."""
+        timestamp = datetime.now().isoformat(timespec='seconds')
+        with file_lock(self.lock_path):
+            with open(self.path, 'a', newline='') as file:
+                if file.tell() == 0:
+                    file.write(f"#generation {time.time_ns()}\r\n")
+                csv.writer(file).writerow([order_id, status, timestamp])
+                file.flush()
+                os.fsync(file.fileno())
+        self.sync()
+
+    @synchronized
+    def status_of(self, order_id, default=None):
+        return self.latest.get(order_id, default)
+
+    @synchronized
+    def changes_since(self, position):
+        """Returns (changes, new position) for the events folded in after the given
+        position of the current generation."""
+        return self.sequence[position:], len(self.sequence)
+
+    def read_events(self):
+        """Returns (latest status per OrderID, generation, end offset) for everything logged so far.
+        Used by compaction, which must not hold the log lock while it rewrites the orders files."""
+        with file_lock(self.lock_path):
+            log = StatusLog(self.path)
+            log.sync()
+        return log.latest, log.generation, log.offset
+
+    def drop_through(self, generation, end):
+        """Removes the events up to the given offset, keeping anything appended since,
+        and starts a new generation."""
+        with file_lock(self.lock_path):
+            with open(self.path, 'rb') as file:
+                first = file.readline()
+                if first.decode().split()[-1] != generation:
+                    return  # Someone else compacted in the meantime
+                file.seek(end)
+                rest = file.read().decode()
+            atomic_write_text(self.path, f"#generation {time.time_ns()}\r\n{rest}")
+        self.sync()
+
+
+def read_complete_lines(file):
+    """Yields (line, offset after it) for each complete line from the current position,
+    stopping before a partially written one."""
+    while True:
+        line = file.readline()
+        if not line.endswith(b'\n'):
+            return
+        if line.strip():
+            yield line, file.tell()
+
+
+_log = None
+
+
+def get_status_log():
+    """Returns the shared StatusLog."""
+    global _log
+    if _log is None:
+        _log = StatusLog()
+    return _log
@@ -0,0 +1,276 @@
+import configparser
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from MenuCatalog import load_catalog, write_menu_rows, MENU_FILE
+from OrderStore import get_order_store, start_compaction, ActiveOrders, ORDERS_FILE
+from OrderWriter import get_order_writer
+from FileWatch import open_change_waiter
+from StatusLog import get_status_log, STATUS_LOG_FILE
+from OrderNumbers import OrderSequence
+from OrderSearch import get_search_index
+from UserStore import get_user_store
+
+CONFIG_FILE = 'storage.ini'
+DEFAULT_DATABASE = 'restaurateur.db'
+
+class Storage(ABC):
+    """What the apps need from wherever orders, users and the menu are kept.
+
+    Orders are dicts with OrderID, CustomerID, Contents, Total and Status, all
+    strings except Contents, which is decoded into the usual list of {name: qty}
+    dictionaries unless decode=False is passed. A backend must implement every
+    abstract method; it cannot be created otherwise."""
+
+    # ---- menu ---------------------------------------------------------------
+
+    @abstractmethod
+    def load_catalog(self):
+        """Returns the current MenuCatalog. The same object is returned for as long
+        as the menu is unchanged, so callers can spot an update by identity."""
+
+    @abstractmethod
+    def write_menu(self, rows, ids):
+        """Replaces the whole menu with the given rows and item IDs."""
+
+    # ---- users --------------------------------------------------------------
+
+    @abstractmethod
+    def user_store(self):
+        """Returns an object with verify(username, password), exists(username) and
+        add_user(username, password) (see UserStore)."""
+
+    # ---- orders -------------------------------------------------------------
+
+    @abstractmethod
+    def next_order_number(self, username, today_date):
+        """Allocates the customer's next order number for the day."""
+
+    @abstractmethod
+    def add_order(self, order):
+        """Stores a new order (Contents already encoded)."""
+
+    @abstractmethod
+    def order_ids(self):
+        """Returns every OrderID, oldest first."""
+
+    @abstractmethod
+    def read_orders(self, order_ids, decode=True):
+        """Returns the given orders, in the given order."""
+
+    @abstractmethod
+    def ids_with_status(self, *statuses):
+        """Returns the OrderIDs having any of the given statuses, oldest first."""
+
+    def orders_with_status(self, *statuses, decode=True):
+        return self.read_orders(self.ids_with_status(*statuses), decode)
+
+    @abstractmethod
+    def update_status(self, order_id, new_status):
+        """Changes the status of an order; raises KeyError if there is no such order."""
+
+    @abstractmethod
+    def active_orders(self, statuses):
+        """Returns an object keeping the orders with the given statuses in memory,
+        with refresh() -> bool (True if they changed) and newest_first()."""
+
+    @abstractmethod
+    def search_orders(self, query):
+        """Returns the OrderIDs (oldest first) matching every word of the query as a
+        prefix of a word of their OrderID, CustomerID or item names, or None for a
+        blank query."""
+
+    @abstractmethod
+    def orders_token(self):
+        """A cheap value that changes whenever an order is added or changes status."""
+
+    def watch_orders(self, callback, interval=0.2):
+        """Calls callback() (on a background thread) soon after orders are added or
+        change status. Returns a watcher whose close() stops it."""
+        return OrderWatcher(self.orders_token, callback, interval, self.watched_paths())
+
+    def watched_paths(self):
+        """Files whose changes move orders_token, for change notifications; with
+        none, watch_orders polls the token every interval seconds."""
+        return []
+
+    def start_maintenance(self):
+        """Starts whatever background upkeep the backend needs."""
+
+
+class CsvStorage(Storage):
+    """The CSV files in the working directory: menu_items.csv, users.csv, orders.csv
+    with a {customer}_orders.csv copy per customer, and the status log."""
+
+    name = 'csv'
+
+    def load_catalog(self):
+        return load_catalog(MENU_FILE)
+
+    def write_menu(self, rows, ids):
+        write_menu_rows(MENU_FILE, rows, ids)
+
+    def user_store(self):
+        return get_user_store()
+
+    def next_order_number(self, username, today_date):
+        return OrderSequence(username).next_number(today_date)
+
+    def add_order(self, order):
+        # Appended to {username}_orders.csv and orders.csv by the group-commit writer;
+        # returns once the row is on disk
+        get_order_writer().submit(order).result()
+
+    def order_ids(self):
+        return get_order_store(ORDERS_FILE).order_ids()
+
+    def read_orders(self, order_ids, decode=True):
+        return get_order_store(ORDERS_FILE).read_orders(order_ids, decode)
+
+    def ids_with_status(self, *statuses):
+        return get_order_store(ORDERS_FILE).ids_with_status(*statuses)
+
+    def update_status(self, order_id, new_status):
+        # One append to the status log; compaction folds it into the CSV files later
+        if order_id not in get_order_store(ORDERS_FILE):
+            raise KeyError(f"Order {order_id} does not exist!")
+        get_status_log().append(order_id, new_status)
+
+    def active_orders(self, statuses):
+        return ActiveOrders(statuses, ORDERS_FILE)
+
+    def search_orders(self, query):
+        return get_search_index().search(query)
+
+    def orders_token(self):
+        # Appends and status log writes both change the size and mtime of a file
+        token = []
+        for path in (ORDERS_FILE, STATUS_LOG_FILE):
+            try:
+                stat = os.stat(path)
+                token.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                token.append(None)
+        return token
+
+    def watched_paths(self):
+        return [ORDERS_FILE, STATUS_LOG_FILE]
+
+    def start_maintenance(self):
+        start_compaction()
+
+
+class OrderWatcher:
+    """Background thread calling callback() whenever token() returns a new value.
+
+    Where the platform has change notifications for the given paths (inotify,
+    Windows directory notifications) the thread sleeps until one of the files is
+    written, and only rechecks the token every `recheck` seconds in case an event
+    was missed. Elsewhere it polls the token every `interval` seconds, which is a
+    stat or a one-row query, so still cheap compared to re-reading the orders."""
+
+    def __init__(self, token, callback, interval=0.2, paths=(), recheck=1.0):
+        self.token = token
+        self.callback = callback
+        self.interval = interval
+        self.paths = list(paths)
+        self.recheck = recheck
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        waiter = open_change_waiter(self.paths)
+        try:
+            last = None
+            failing = False
+            while not self.stopped.is_set():
+                try:
+                    token = self.token()
+                    failing = False
+                except Exception as e:
+                    if not failing:  # Reported once, not on every check while it lasts
+                        print(f"Error watching orders: {e}")
+                        failing = True
+                    token = last
+                if last is not None and token != last:
+                    self.callback()
+                last = token
+                if waiter is not None:
+                    waiter.wait(self.recheck)
+                else:
+                    self.stopped.wait(self.interval)
+        finally:
+            if waiter is not None:
+                waiter.close()
+
+    def close(self):
+        """Stops the watcher; with change notifications it exits within `recheck` seconds."""
+        self.stopped.set()
+
+
+def read_config(path=CONFIG_FILE):
+    """Returns (backend name, database path) from storage.ini; CSV if there is none:
+
+        [storage]
+        backend = sqlite
+        database = restaurateur.db"""
+    config = configparser.ConfigParser()
+    config.read(path)
+    backend = config.get('storage', 'backend', fallback='csv').strip().lower()
+    database = config.get('storage', 'database', fallback=DEFAULT_DATABASE).strip()
+    return backend, database
+
+
+def read_service_address(path=CONFIG_FILE):
+    """Returns (host, port) of the order service from storage.ini, or None if the
+    apps are to use the backend directly:
+
+        [service]
+        host = 127.0.0.1
+        port = 8765"""
+    config = configparser.ConfigParser()
+    config.read(path)
+    if not config.has_section('service'):
+        return None
+    return config.get('service', 'host', fallback='127.0.0.1').strip(), config.getint('service', 'port', fallback=8765)
+
+
+def open_local_storage():
+    """Creates the backend selected in storage.ini, accessed directly from this process."""
+    backend, database = read_config()
+    if backend == 'sqlite':
+        from SqliteStorage import SqliteStorage
+        return SqliteStorage(database)
+    if backend == 'csv':
+        return CsvStorage()
+    raise ValueError(f"Unknown storage backend {backend!r} in {CONFIG_FILE}")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Returns the storage the apps use, created on first use: the order service if
+    storage.ini names one (with the local backend as fallback), else the local backend."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            address = read_service_address()
+            if address is not None:
+                from OrderService import ServiceStorage
+                _storage = ServiceStorage(address, open_local_storage())
+            else:
+                _storage = open_local_storage()
+        return _storage
+
+
+if __name__ == "__main__":
+    # python Storage.py migrate [database]: copies the CSV data into an SQLite database
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        from SqliteStorage import migrate_from_csv
+        migrate_from_csv(sys.argv[2] if len(sys.argv) > 2 else read_config()[1])
+    else:
+        print("Usage: python Storage.py migrate [database]")
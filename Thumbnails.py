@@ -0,0 +1,40 @@
+import hashlib
+import os
+from PIL import Image
+
+THUMB_DIR = 'thumb_cache'
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_thumbnail(source, height, width=None):
+    """Returns the source image resized to (width, height) as a loaded PIL Image; with
+    no width, the source's aspect ratio is kept.
+
+    Resized variants are cached on disk under thumb_cache/, keyed by a hash of the
+    source file and the target size, so the same photo is only ever decoded at
+    full size and resized once. Meant to run on a worker thread (see TkExecutor);
+    turning the result into a PhotoImage must happen on the Tk thread."""
+    size_key = f"{width}x{height}" if width else f"h{height}"
+    cached = os.path.join(THUMB_DIR, f"{file_hash(source)}_{size_key}.png")
+    if os.path.isfile(cached):
+        image = Image.open(cached)
+        image.load()
+        return image
+
+    image = Image.open(source)
+    if width is None:
+        w, h = image.size
+        width = max(1, int(height * w / h))
+    image = image.resize((width, height), Image.LANCZOS)
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    temp_path = f"{cached}.tmp{os.getpid()}.png"
+    image.save(temp_path)
+    os.replace(temp_path, cached)
+    return image
@@ -0,0 +1,103 @@
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 30
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='io')
+
+
+def run_in_background(widget, fn, *args, on_done=None, on_error=None, busy=None):
+    """Runs fn(*args) on a worker thread and calls on_done(result) - or on_error(exception) -
+    back on the Tk thread, by polling the future with widget.after().
+
+    Tk must only be touched from the thread running mainloop, which is why the
+    result is handed over this way rather than from the worker. If the widget is
+    destroyed before the work finishes, the result is dropped. A BusyState passed
+    as busy is shown until the work is done."""
+    future = _pool.submit(fn, *args)
+    if busy is not None:
+        busy.begin()
+
+    def poll():
+        try:
+            if not widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        if not future.done():
+            widget.after(POLL_MS, poll)
+            return
+        if busy is not None:
+            busy.end()
+        try:
+            result = future.result()
+        except Exception as e:
+            if on_error is not None:
+                on_error(e)
+            else:
+                print(f"Background task failed: {e}")
+            return
+        if on_done is not None:
+            on_done(result)
+
+    widget.after(POLL_MS, poll)
+    return future
+
+
+class BusyState:
+    """Shows that a window is waiting on background work without blocking it: while
+    any task is running, the label shows `text`, the given widgets are disabled
+    and the window gets a busy cursor."""
+
+    def __init__(self, label, text="Working...", widgets=()):
+        self.label = label
+        self.text = text
+        self.widgets = widgets
+        self.count = 0
+
+    def begin(self):
+        self.count += 1
+        if self.count == 1:
+            self.show(True)
+
+    def end(self):
+        self.count -= 1
+        if self.count == 0:
+            self.show(False)
+
+    def show(self, busy):
+        try:
+            self.label.config(text=self.text if busy else "")
+            self.label.winfo_toplevel().config(cursor="watch" if busy else "")
+            for widget in self.widgets:
+                widget.config(state="disabled" if busy else "normal")
+        except tk.TclError:
+            pass  # The window is being destroyed
+
+
+class TkNotifier:
+    """Lets any thread ask for callback() to run on the Tk thread: set() only flips a
+    threading.Event, which the Tk side checks every poll_ms. Several set() calls
+    before the next check run the callback once."""
+
+    def __init__(self, widget, callback, poll_ms=POLL_MS):
+        self.widget = widget
+        self.callback = callback
+        self.poll_ms = poll_ms
+        self.event = threading.Event()
+        widget.after(poll_ms, self.poll)
+
+    def set(self):
+        self.event.set()
+
+    def poll(self):
+        try:
+            if not self.widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        if self.event.is_set():
+            self.event.clear()
+            self.callback()
+        self.widget.after(self.poll_ms, self.poll)
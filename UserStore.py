@@ -0,0 +1,145 @@
+import csv
+import hashlib
+import hmac
+import io
+import os
+import threading
+from FileOps import file_lock, lock_path_for, atomic_write_text
+
+USERS_FILE = 'users.csv'
+HASH_SCHEME = 'pbkdf2_sha256'
+HASH_ITERATIONS = 200000
+
+
+def hash_password(password, salt=None, iterations=HASH_ITERATIONS):
+    """Returns the stored form of a password: pbkdf2_sha256$<iterations>$<salt>$<hash>."""
+    salt = os.urandom(16) if salt is None else salt
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_SCHEME + '$')
+
+
+def check_password(stored, password):
+    """Checks a password against its stored form, hashed or (legacy) plaintext."""
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+    try:
+        _, iterations, salt, digest = stored.split('$')
+        expected = hash_password(password, bytes.fromhex(salt), int(iterations)).rsplit('$', 1)[1]
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected, digest)
+
+
+class UserStore:
+    """users.csv held in memory as {username: stored password}, so a login is a
+    dictionary lookup. The index is reloaded when the file's mtime or size
+    changes, e.g. after another terminal registers a user.
+
+    Passwords are stored as salted PBKDF2 hashes; rows still holding a plaintext
+    password (written before hashing) are upgraded the first time their user logs in."""
+
+    def __init__(self, path=USERS_FILE):
+        self.path = path
+        self.users = {}
+        self.key = None
+        self.lock = threading.Lock()
+
+    def sync(self):
+        """Reloads the index if the file changed. Raises FileNotFoundError if it does not exist."""
+        stat = os.stat(self.path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key == self.key:
+                return
+            users = {}
+            with open(self.path, 'r', newline='') as file:
+                reader = csv.reader(file)
+                next(reader, None)  # Skip the header row
+                for row in reader:
+                    if len(row) >= 2:
+                        users[row[0]] = row[1]
+            self.users = users
+            self.key = key
+
+    def exists(self, username):
+        self.sync()
+        return username in self.users
+
+    def verify(self, username, password):
+        """Returns True if the username and password match a registered user."""
+        self.sync()
+        stored = self.users.get(username)
+        if stored is None or not check_password(stored, password):
+            return False
+        if not is_hashed(stored):
+            try:
+                self.upgrade(username, password)
+            except OSError as e:
+                print(f"Error upgrading the password of {username}: {e}")
+        return True
+
+    def add_user(self, username, password):
+        """Registers a user unless the name is taken, atomically across terminals.
+        Returns False if the username already exists."""
+        stored = hash_password(password)
+        with file_lock(lock_path_for(self.path)):
+            if not os.path.exists(self.path):
+                atomic_write_text(self.path, "username,password\r\n")
+            self.sync()
+            if username in self.users:
+                return False
+            line = io.StringIO()
+            csv.writer(line).writerow([username, stored])
+            with open(self.path, 'r+b') as file:
+                # Start on a new line even if the last one was left unterminated
+                file.seek(0, os.SEEK_END)
+                if file.tell() > 0:
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b'\n':
+                        file.write(b'\r\n')
+                file.write(line.getvalue().encode('utf-8'))
+                file.flush()
+                os.fsync(file.fileno())
+            self.sync()
+        return True
+
+    def upgrade(self, username, password):
+        """Replaces a plaintext password in the file with its hash."""
+        with file_lock(lock_path_for(self.path)):
+            self.sync()
+            if is_hashed(self.users.get(username, '')):
+                return
+            text = io.StringIO()
+            writer = csv.writer(text)
+            writer.writerow(["username", "password"])
+            for name, stored in self.users.items():
+                writer.writerow([name, hash_password(password) if name == username else stored])
+            atomic_write_text(self.path, text.getvalue())
+            self.sync()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_user_store(path=USERS_FILE):
+    """Returns the shared UserStore."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = UserStore(path)
+        return _store
+
+
+def warm_user_store(path=USERS_FILE):
+    """Loads the user index on a background thread, so the first login does not wait for it."""
+    def load():
+        try:
+            get_user_store(path).sync()
+        except OSError:
+            pass  # Reported when someone actually logs in
+    threading.Thread(target=load, daemon=True).start()
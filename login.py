@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import messagebox
-import csv  # For reading user data from CSV
+from UserStore import warm_user_store
+from Storage import get_storage
+from TkExecutor import BusyState, run_in_background
 from Menu import RestaurantApp
 from RestaurantDashboard import AdminDashboard
 
@@ -47,6 +49,9 @@ class LoginWindow:
         # Make sure closing the login window closes the whole application
         self.top.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Load the registered users while the window is being filled in
+        warm_user_store()
+
         # Welcome message with increased font
         welcome_label = tk.Label(self.top, text="Welcome back, you've been missed!", 
                                  font=("Arial", 14, "bold"), bg="#F5F5F5")  # Increased font
@@ -58,6 +63,11 @@ class LoginWindow:
         # Login button
         self.create_login_button()
 
+        # Shown while the users file is read or written in the background
+        self.busy_label = tk.Label(self.top, font=("Arial", 9), bg="#F5F5F5", fg="grey")
+        self.busy_label.pack()
+        self.busy = BusyState(self.busy_label, "Please wait...", (self.login_customer_button, self.login_restaurant_button))
+
         # Forgot password option
         forgot_label = tk.Label(self.top, text="Forgot Password?", font=("Arial", 9), 
                                 bg="#F5F5F5", fg="blue", cursor="hand2")
@@ -90,19 +100,34 @@ class LoginWindow:
     def login_customer(self):
         username = self.username_entry.get()
         password = self.password_entry.get()
-        # Check username and hashed password in the CSV file
+        # Check username and hashed password in the user store on a worker thread
+        run_in_background(self.top, self.verify_customer, username, password,
+                          on_done=lambda verified: self.open_customer_app(username, verified),
+                          on_error=lambda e: self.show_users_error("Login Failed", e), busy=self.busy)
+
+    def verify_customer(self, username, password):
+        """Runs on a worker thread. Also reads the menu for the window about to open."""
+        if not get_storage().user_store().verify(username, password):
+            return False
         try:
-            with open('users.csv', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:                  
-                    if row['username'] == username and row['password'] == password:
-                        self.app = RestaurantApp(self.parent,username)
-                        self.app.user = username
-                        self.top.destroy()
-                        return
-                messagebox.showerror("Login Failed", "Invalid username or password.")
-        except FileNotFoundError:
+            get_storage().load_catalog()
+        except (OSError, ValueError):
+            pass  # Reported by the menu window
+        return True
+
+    def open_customer_app(self, username, verified):
+        if not verified:
+            messagebox.showerror("Login Failed", "Invalid username or password.")
+            return
+        self.app = RestaurantApp(self.parent,username)
+        self.app.user = username
+        self.top.destroy()
+
+    def show_users_error(self, title, error):
+        if isinstance(error, FileNotFoundError):
             messagebox.showerror("File Not Found", "The users file was not found.")
+        else:
+            messagebox.showerror(title, f"Could not read the users: {str(error)}")
 
     
     def login_restaurant(self):
@@ -127,12 +152,12 @@ class LoginWindow:
         signinlabel = tk.Label(button_frame, text='Sign in as: ' , font=("Arial", 12, "bold"), fg="#4CAF50", bd=0, relief="flat", activebackground="#45A049")
         signinlabel.grid(row=0, column=0, sticky='E')
         
-        login_customer_button = tk.Button(button_frame, text="Customer", font=("Arial", 12, "bold"), 
+        self.login_customer_button = login_customer_button = tk.Button(button_frame, text="Customer", font=("Arial", 12, "bold"), 
                                  bg="#4CAF50", fg="white", bd=0, relief="flat", cursor="hand2", padx= 3,
                                  activebackground="#45A049", height=2, command=self.login_customer)
         login_customer_button.grid(row = 0, column=1, sticky='W', padx= 3)
 
-        login_restaurant_button = tk.Button(button_frame, text="Restaurant",  font=("Arial", 12, "bold"), 
+        self.login_restaurant_button = login_restaurant_button = tk.Button(button_frame, text="Restaurant",  font=("Arial", 12, "bold"), 
                                  bg="#4CAF50", fg="white", bd=0, relief="flat", cursor="hand2", padx = 3,
                                  activebackground="#45A049", height=2,command=self.login_restaurant)
         login_restaurant_button.grid(row = 0, column=2, sticky='w', padx=3)
@@ -144,14 +169,14 @@ class LoginWindow:
             messagebox.showwarning("Input Error", "Please enter your username.")
             return
 
-        # Attempt to retrieve the password for the entered username
-        with open('users.csv', mode='r') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                if row[0] == username:
-                    # If username is found, display the password
-                    messagebox.showinfo("Password Recovery", "Contact Admin to recover password.")
-                    return
+        # Passwords are only stored hashed, so the admin has to reset it
+        run_in_background(self.top, lambda: get_storage().user_store().exists(username),
+                          on_done=self.show_recovery, on_error=lambda e: self.show_users_error("Error", e), busy=self.busy)
+
+    def show_recovery(self, exists):
+        if exists:
+            messagebox.showinfo("Password Recovery", "Contact Admin to recover password.")
+            return
 
         # If username is not found, show an error message
         messagebox.showerror("User Not Found", "Username not found.")
@@ -165,18 +190,16 @@ class LoginWindow:
             messagebox.showwarning("Input Error", "Please enter both username and password.")
             return
 
-        # Check if the username already exists
-        with open('users.csv', mode='r') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                if row[0] == username:
-                    messagebox.showerror("Registration Error", "Username already exists. Please choose another one.")
-                    return
-
-        # If the username doesn't exist, append the new user to the CSV file
-        with open('users.csv', mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([username, password])
+        # Register the user unless the name is taken (checked and added atomically), on a worker thread
+        run_in_background(self.top, lambda: get_storage().user_store().add_user(username, password),
+                          on_done=self.show_registration,
+                          on_error=lambda e: messagebox.showerror("Registration Error", f"Could not save the new user: {str(e)}"),
+                          busy=self.busy)
+
+    def show_registration(self, added):
+        if not added:
+            messagebox.showerror("Registration Error", "Username already exists. Please choose another one.")
+            return
 
         messagebox.showinfo("Registration Successful", "You have been registered successfully! You can now log in.")
 